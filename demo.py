@@ -12,11 +12,153 @@ GitHub: https://github.com/Mehulchhabra07/Automated-Test-of-Design---Internal-Co
 
 import os
 import sys
-from pathlib import Path
 
-def print_banner():
-    """Display an attractive banner for the demo"""
-    banner = """
+REQUIRED_PACKAGES = ('pandas', 'openpyxl', 'xlsxwriter', 'openai', 'httpx', 'orjson')
+
+_SEP = "=" * 60
+
+# Pre-bound formatters for the per-package status lines
+_OK_MSG = "✅ {} installed".format
+_MISSING_MSG = "❌ {} missing".format
+
+# Enhanced sample data with more realistic examples
+SAMPLE_DATA = {
+    'Risk': ['R001', 'R002', 'R003', 'R004'],
+    'Risk Description': [
+        'Risk of unauthorized access to sensitive financial data resulting in data breaches, fraud, or regulatory violations',
+        'Risk of erroneous financial reporting due to manual data entry errors, system glitches, and lack of validation controls', 
+        'Risk of incomplete expense approvals leading to unauthorized payments, budget overruns, and fraud',
+        'Risk of inadequate data backup and recovery procedures resulting in data loss during system failures or cyber attacks'
+    ],
+    'Control': ['C001', 'C002', 'C003', 'C004'],
+    'Control Description': [
+        'The IT Security Manager performs monthly comprehensive review of user access privileges including role verification, dormant account identification, access rights validation, and segregation of duties compliance in the SAP financial system',
+        'Automated system validation checks are performed in real-time on all financial entries with exception reporting to the Finance Manager, including data type validation, range checks, duplicate detection, and business rule verification',
+        'Department heads review and approve all expenses above $1,000 using digital approval workflow with dual authorization requirement, documented business justification, and budget availability verification',
+        'IT team performs weekly automated backups of critical financial data with monthly restore testing, quarterly disaster recovery drills, and annual business continuity plan review'
+    ],
+    'Automation': ['Manual', 'Automated', 'Semi-Auto', 'Automated'],
+    'Detective/ Preventive': ['Detective', 'Preventive', 'Preventive', 'Preventive'],
+    'Operation Frequency': ['Monthly', 'Real-time', 'As needed', 'Weekly']
+}
+
+# sample_controls.xlsx built from SAMPLE_DATA, embedded so the demo can write it
+# without going through pandas/openpyxl
+_SAMPLE_XLSX_B64 = """
+UEsDBBQAAAAIADoPT11Gx01IlQAAAM0AAAAQAAAAZG9jUHJvcHMvYXBwLnhtbE3PTQvCMAwG4L9S
+dreZih6kDkQ9ip68zy51hbYpbYT67+0EP255ecgboi6JIia2mEXxLuRtMzLHDUDWI/o+y8qhiqHk
+e64x3YGMsRoPpB8eA8OibdeAhTEMOMzit7Dp1C5GZ3XPlkJ3sjpRJsPiWDQ6sScfq9wcChDneiU+
+ixNLOZcrBf+LU8sVU57mym/8ZAW/B7oXUEsDBBQAAAAIADoPT11QDBoY6wAAAMsBAAARAAAAZG9j
+UHJvcHMvY29yZS54bWylkcFqwzAMhl+l+J7ITkgHxs1lpacNBits7GZstQ2LE2NrJH37OVmbbmy3
+Ha3/0ycJK+Ol6QM+hd5joAbjanRtF6XxG3Yi8hIgmhM6HfNEdCk89MFpSs9wBK/Nuz4iFJyvwSFp
+q0nDJMz8YmQXpTWL0n+EdhZYA9iiw44iiFzAjSUMLv7ZMCcLOcZmoYZhyIdy5tJGAl4fH57n5bOm
+i6Q7g6xW1kgTUFMf6ukifx5bBd+K6jL7q4B2lSZIOnvcsGvyUt5v9ztWF7xYZ4JnotpzIas7WZVv
+k+tH/03oetscmn8Yr4Jawa9/qz8BUEsDBBQAAAAIADoPT12ZXJwj/wUAAJwnAAATAAAAeGwvdGhl
+bWUvdGhlbWUxLnhtbO1aW3PaOBR+76/QeGf2bYuNbQJtaSfm0nbbtJmE7U4fhRFYjWx5JJGEf79H
+NhDLNoZ2SZPuhgeMJX3fuejoHMnm1ZvbmKFrIiTlSd9yntvWm9fPXuEXKiIxQdCZyBe4b0VKpS9a
+LRlCM5bPeUoS6JtzEWMFt2LRmgl8Q5NFzFpt2+60YkwTCyU4Jn3r83xOQ4ImmtJ6/QyhDf+IwVei
+pG7LWkMmLsNMchFp5f3ZiNmVs7nL7uVKDphA15j1LZA/4zcTcqssxLBU0NG37OxjtbYcLYMEKJja
+R1mgG2cfk65AkGnYNunEYrrlc8Ze72RY1qZtaNMAH41Gg5FTll6E4zAEjzq7Kbxx1wlKGpRAW5oG
+TQa2b3u1NFVt3N00vSAI/F4djVuh8XbTdO2Od9quo/EqNH6Db4LTwaBTR+NXaDq7acYnvY5XS9Mp
+0ESMJle7SXTUlgPNgABgztm7ZpYusHRL0W+idMt22W0X4pwnas9KjPE3LsYwzpDOsKIJUquUzHEI
+uAGOp4LiOw2yUQQXhpT6Qrm7T6uFZChoqvrWnymGFHM39vffbsfj9vBldnXdlyj/YesG1w689fUk
+vw7c/Ho6ftkk5B1OFiUhQW/oaOzgxLMzIaeDUSYk8B1/H5kskflBN9BYb+y7+7CqhO34QSb3ZJgb
+2enYI33tnQ69Rq5TgadFrgmNiUSfyA264DE4tUkNMhU/CJ1EmBpQHAGkCTFSkYH4tMKsERAQc7a+
+CMjfjYi3y2+GPZeRWCrahPgQxQbijHMWcNFs+wetRtH2ZbLYo5dYFgEXGF83qjUoxdZomcLypY1C
+BhExTDlnEGR4QRKikO7jV4Q04b9SaszPGQ0Fl3yu0FeKAkybHTmhU1WPfkdjmOgV3hNNhkfPvqCA
+s0aBQ3JtQmBtY9YohDBjFt7ipcJxs1U4ZkXIR6yiRkMuVyI0Jk4qCKYFYRyNZkTKRvBnsTJM+oAh
+szdH1hlbxSZEKHrVCPmIOS9ChvxqEOE4bbaLJlER9F5ewUrB6JyrZv24uYb1PUwsTvZH1BdK1A8m
+p7/oIqoPRt2zFGYJrdQ+XQ9pclA9ZBQK4lM9fMz18BR2LOx7quBewH+09g3xMjknsM6fSt9T6Xsq
+fY+o9O3NSN9Z8Mzilh8jN0fEu1NjvO/QOKeMXaoVIx+lWScl2DkbQ+9da96e8W3Ps2kEPw2zWrVY
+QC4EzhqR4OpvqqLLCKegk2OVJCykocu2FaVcwjHcMrt2K1Uelz/mouDybJBvPoYy+bA647N8nGvX
+D8wM3cgtqdvS+u40wdWij2WGe/JQZjg545HscPwD7fCPYEfeUgozvTmErSHkO9Cm086tg+WJGZnp
+MC0F+SacH1+MywjPyDrIncO86rjHjo7uvw+Ogh0996HsOEaUFw3xDjXEf5Awt/eFeVZpaoqGpk1q
+KwlL0A0Y7rd9C4U47VtzOIPBzzgFeVIXWMwWSd8KlSgvk9oidLjzS67f4dGS4+26YTvdvqPcZbSp
+kGqIZZQTZ6PK3mVJjavavqen5H591bpvK9yu86takd/VRDiZz0moaqO80FUSnffU5Xu+VERcRrMb
+NGVLcYHBO16+HGdUwpawvbkRkMm99Uo1K0t9Ziq/t6hJYPmbE5ZGeF1Xu7vzTU5XXRFb/cuzUGPy
+XXPJR/flO/cn+s5/8t1j9d06d5CEuLOKI0I4FQmMdHLoW1yoiEO5SyMajgUcpupMBC8gSGbaAYjp
+N/TaM+S6VDi37/Ey/opYBgc6dUEXSFAowioShJyrtb+/T6rTrt3WZwlsLaSSIau+0B5Ka9wzJdeE
+TXQy7+hpslC0KU7VvGvgdwRsqdnMrdPF+H97FvXsn3j4MUzwjnmG85rOcIWNWO+hrD3yZr594LS1
+/XvczKdYRUh/wX6KipARq2K+3q9P+AWsO7R98IEgm/zRXaf2beMUfNStWqVlaxG/ygn4LiS79q/8
+eKQQa+6hsWbbjzLW/JpQ83800nRbXb3IDqdx4Smobqj8s03vgKbfQMMhmeMlU7K1biW3SuDB5r83
+wAodW4bXz/4BUEsDBBQAAAAIADoPT12mv2vHrQQAACUOAAAYAAAAeGwvd29ya3NoZWV0cy9zaGVl
+dDEueG1snZfbbuM2EIZfhTB66V05PrTFwjGQjZvtXiwaJNvuNS2OJDYUqfBgr/v0naFkxwlIG8iV
+ThyS8883w9FyZ+yTawA8+9kq7a5Hjffdp6JwZQMtdx9NBxq/VMa23OOjrQvXWeAiGrWqmE4mvxYt
+l3q0WsZ393a1NMErqeHeMhfaltv9Z1Bmdz26Gh1ePMi68fFFsVp2vIZH8H93aICPxXEeIVvQThrN
+LFTXo5urT18W0SKO+EfCzp3cM3JmY8wTPXwV16MJ7QkUlJ6m4HjZwi0oRTPhTp6HSUcvi5Ll6f1h
++rvoP25vwx3cGvVDCt9cj34fMQEVD8o/mN2fMPh0ssU193y1tGbHLDm7WpZ0Q0viQKlJpEdv8b3E
+lfzqQbqnZeFxB/RclMP4z+fGszW40sqOfEzY3uZsb4321qiEyfqCyYUV/8iZ3wRvUMW01V3Oag0e
+YuQKdm9hC5ruExN8yU3wVwc2rsruLDwH0OX+tXmB8TkGaXoM0jQn+mRylQrS9FyQTMWC5sE3xsr/
+QCCMJTjHvGGOCCefWCU116XkignEBpF3CJbUNZO6f7PBxMO8dGNWWR7EmBmLo+qguDd2z7bSqOio
+S3GQ295t2p11bvz3BtjX7+wRymCl37NvXGP6WoYqU5VwrEVKGrVnpWmxUjTkHjqHoaMUJR0cjh78
+76zcSgU1OHSyVEGQu4gYsC1YWcky+jNmgvJPezIzAa9SEAcv34fpLGWgY1uupDh80QIlrlGmngHc
+gAhe4oK0PyVRcSCBPbr1eHN/EgS3dx7aFOA5aVCKwFMZdTe9BHcK6OwyvcBnIJ4dIZ7lIZ6mIJ5d
+gBisNRpMcCdCWeiMjaCKAIR0G3XomcU4IZpkZpHbXlNWK+l7kCk8ipdx7pewYWxipUmCPMuDnHJp
+PTtfjjAZh12drt9A+eQYt3DgGodJOoa4+uDxVGJ0oCh1ogI5SljtpG8Y/Cwh1scTcVAYguwuWsAh
+b8Yn4EfB/L6DVwRbrmsYdoSZEBBaxB7w5PH9ydaruAkOHaQkCG/SJ4XwRVFSFOeMztflLFIHLc+A
+PD+CPM+DPEuBPL8AMqpO+Y8aYrCwyXHAeNdZg8o7prDBGUL2qmp3fI8NiccwbIKosWkyqLMNegA5
+VuUUsvM8sqnNr+fZctFx62kLrKEe7FBVafF+9xCpHDxCgDf06per8WQyYQQIQiZr6ZHXg7exa6qw
+PevJFZS5B5f5gPBzkBZoWarEZaA7OCHu3+BeFeNIY9SHb7lUfCMVnRSXmMx5/Qit/EBgppicv4vJ
+nNWNYxpAvMX/FZOLI5OLPJPzFJOLi0xygVrH5I7nPRbG0EU9LZTE2h5PTFOCCNgcJBoEZTAa+JHe
+DUWtwgDE0dgrlPsNHb3e47zJ0rrIc5pyaJ0bj/2BB96+9AQ7gCdsCfix5PauOfIaW0mPVKi3/U/E
+8dBMoAfY4+Dpglf0bsxQJuvB4ichHUdX7YtGwkqlhpzkOp5FR1bpZJE6EI+d4nrIoBSOi/eUyMW7
+cMxZ/YiypVgsTn4v6PfpG7e11FS5Kpxp8vE3nNL2/yP9gzdd/N3aGI/bj7dUQsDSAPxeGeOPD/Q/
+dPwzXP0PUEsDBBQAAAAIADoPT13SBfFGUgIAAEcKAAANAAAAeGwvc3R5bGVzLnhtbN1W246bMBD9
+FcQHFBJUC6qEhyJFqtRWK+0+9NUEQyz5Qo1ZkX59PTa57g5V2reCIubiM+d4PIhsBnsU7PnAmI0m
+KdSwjQ/W9p+SZNgfmKTDB90z5TKtNpJa55ouGXrDaDMASIpknaYkkZSruNyoUe6kHaK9HpXdxmkc
+JeWm1eoSWsUh4NZSyaJXKrZxRQWvDQ+LqeTiGOJrH9lroU1knRoGcAgNv8KC1eyC1LmW5EobH00C
+jX8MrjAX4qxiHYdAuemptcyonXMCyEff5mb75dg7FZ2hx9X6Y3yF8A9HU2vTMHOz3RAqN4K1FhCG
+dwdvWN3Do9bWaglWw2mnFQ1KTrDZcLX3TIhnOK8f7Q3B1Eah8V8a33PY8cl0qmYzlJkdILguF4r/
+e92ev2r7eXQbUt7/OWrLngxr+eT9qb0TcOb2Sm7oz9EIRmUbf4cRFFc16pELy9XsHXjTMPV2d66+
+pbUb8hsCt6phLR2FfTknt/HF/sYaPsrivOoJNjavuthf4ShX5DKnjoyrhk2sqWbXdLU3I2c42vny
+iPvUzl9ICkWFJJKCJMqFykBRAYdy/Y/7ytMFhXm6oDBPkYIoKsdRAfduqvI3yoWgCnchWy6KLCME
+bW9VvS+jQntICPyQgjm+ZUJQLmB7tPMLA7AwNn+YjTz9m7HJHx7s0OBHOw8ppIeAKQpkAFAuwKCH
+gk4UiEC4YNQQVJbBOaMK0dd8IVUUaAqGFJleQrBGEbiR80JfoiwrCoKjEBlZhqbghV1IoTJACJrK
+svAhvfueJafvXHL561j+BlBLAwQUAAAACAA6D09dt0frisAAAAAWAgAACwAAAF9yZWxzLy5yZWxz
+nZJLbgIxDECvEmVfTKnEAjGs2LBDiAu4ieejmcSRY8T09o3YwCBoEUv/np4trw80oHYcc9ulbMYw
+xFzZVjWtALJrKWCecaJYKjVLQC2hNJDQ9dgQLObzJcgtw27Wt0xz/En0CpHrunO0ZXcKFPUB+K7D
+miNKQ1rZcYAzS//N3M8K1Jqdr6zs/Kc18KbM8/UgkKJHRXAs9JGkTIt2lK8+nt2+pPOlY2K0eN/o
+//PQqBQ9+b+dMKWJ0tdFCSZvsPkFUEsDBBQAAAAIADoPT132dQGqMAEAACkCAAAPAAAAeGwvd29y
+a2Jvb2sueG1sjZDRTsMwDEV/pcoH0G6CSUzrXpiASQgQQ3vPWne1lsSV426wrydJKUzihSfH19bJ
+vV6ciA87okP2YY3zcy5VK9LN89xXLVjtr6gDF2YNsdUSWt7n1DRYwYqq3oKTfFoUs5zBaEFyvsXO
+q4H2H5bvGHTtWwCxZkBZjU4tF6OzV87yy44EqvhTVKOyRTj534XYZkf0uEOD8lmq9DagMosOLZ6h
+LlWhMt/S6ZEYz+REm03FZEypJsNgCyxY/ZE30ea73vmkiN69xcylmhUB2CB7SRuJr4PJI4TloeuF
+7tEI8EoLPDD1Hbp9woQY+UWOdIqxZk5bKFWiJg+hruvBjwTQRTqeYxjwuv5GjpwaGnRQPweQj4OQ
+qgonjSWRptc3k9vgvjfmLmgv7ol0/WNsvOryC1BLAwQUAAAACAA6D09dM+vjuq0AAAD7AQAAGgAA
+AHhsL19yZWxzL3dvcmtib29rLnhtbC5yZWxztZE9DoMwDIWvEuUAGKjUoQKmLqwVF4iC+RGBRLGr
+wu0bwQBIHbowWc+Wv/dkZy80ins7Udc7EvNoJsplx+weAKQ7HBVF1uEUJo31o+IgfQtO6UG1CGkc
+38EfGbLIjkxRLQ7/Idqm6TU+rX6POPEPMHysH6hDZCkq5VvkXMJs9jbBWpIokKUo61z6sk6kgMsS
+ES8GaY+z6ZN/eqU/h13c7Ve5Nc9HuK0h4PTr4gtQSwMEFAAAAAgAOg9PXZuGQoQZAQAA1wMAABMA
+AABbQ29udGVudF9UeXBlc10ueG1srZNNbsIwEIWvEmWLYkMXXVSETdtty6IXcJ0JsfCfPAMNt+/E
+KVlUFKhgEyueN+8b+yXLj0MELHpnPdZlRxSfpETdgVMoQgTPlTYkp4hf00ZGpbdqA/JhPn+UOngC
+TxUNHuVq+QKt2lkqXnveRhN8XSawWBbPo3Bg1aWK0RqtiOty75tflOqHILgza7AzEWcsKAt5EpFL
+fxKOje97SMk0UKxVojflWCZ7K5EOFlCc9zgxZWhbo6EJeue4RWBMoBrsAMhZMZrOLqCJLxnG5+Lm
+AbLNWSJL1ylE5NQS/J93jGXoriIbQSJz4ZATkr1vPiEMiTfQXAvnG/4KaZszQZmXxZ1znvyvGeQz
+hO29v7NhFU4ZPw0g8/+8+gZQSwECFAMUAAAACAA6D09dRsdNSJUAAADNAAAAEAAAAAAAAAAAAAAA
+gAEAAAAAZG9jUHJvcHMvYXBwLnhtbFBLAQIUAxQAAAAIADoPT11QDBoY6wAAAMsBAAARAAAAAAAA
+AAAAAACAAcMAAABkb2NQcm9wcy9jb3JlLnhtbFBLAQIUAxQAAAAIADoPT12ZXJwj/wUAAJwnAAAT
+AAAAAAAAAAAAAACAAd0BAAB4bC90aGVtZS90aGVtZTEueG1sUEsBAhQDFAAAAAgAOg9PXaa/a8et
+BAAAJQ4AABgAAAAAAAAAAAAAAICBDQgAAHhsL3dvcmtzaGVldHMvc2hlZXQxLnhtbFBLAQIUAxQA
+AAAIADoPT13SBfFGUgIAAEcKAAANAAAAAAAAAAAAAACAAfAMAAB4bC9zdHlsZXMueG1sUEsBAhQD
+FAAAAAgAOg9PXbdH64rAAAAAFgIAAAsAAAAAAAAAAAAAAIABbQ8AAF9yZWxzLy5yZWxzUEsBAhQD
+FAAAAAgAOg9PXfZ1AaowAQAAKQIAAA8AAAAAAAAAAAAAAIABVhAAAHhsL3dvcmtib29rLnhtbFBL
+AQIUAxQAAAAIADoPT10z6+O6rQAAAPsBAAAaAAAAAAAAAAAAAACAAbMRAAB4bC9fcmVscy93b3Jr
+Ym9vay54bWwucmVsc1BLAQIUAxQAAAAIADoPT12bhkKEGQEAANcDAAATAAAAAAAAAAAAAACAAZgS
+AABbQ29udGVudF9UeXBlc10ueG1sUEsFBgAAAAAJAAkAPgIAAOITAAAAAA==
+"""
+
+# Accepted answers to the confirmation prompt
+_YES = frozenset({"y", "yes"})
+_NO = frozenset({"n", "no"})
+
+# Analysis entry point, imported by run_demo on first use
+_main_fn = None
+
+# Set when setup_demo writes the sample file, so run_demo can hand the
+# analysis SAMPLE_DATA directly instead of having it re-read the workbook
+_sample_created = False
+
+_UNICODE_BANNER = """
     ╔══════════════════════════════════════════════════════════════╗
     ║                🤖 AI-Powered TOD Control Analysis             ║
     ║                        Demo Application                      ║
@@ -24,40 +166,64 @@ def print_banner():
     ║   Transform your internal control testing with AI! 🚀       ║
     ╚══════════════════════════════════════════════════════════════╝
     """
-    print(banner)
 
-def setup_demo():
+# Used when stdout is not UTF-8 (e.g. legacy Windows consoles)
+_ASCII_BANNER = """
+    +==============================================================+
+    |                  AI-Powered TOD Control Analysis             |
+    |                        Demo Application                      |
+    |                                                              |
+    |   Transform your internal control testing with AI!           |
+    +==============================================================+
+    """
+
+# Dimensions evaluated for every control, shown by display_analysis_preview.
+# Interned so anything keying on these labels compares by identity.
+_DIMENSIONS = tuple((sys.intern(dimension), sys.intern(description)) for dimension, description in (
+    ("🎯 Completeness", "6W Framework (Who, What, When, Where, Why, How)"),
+    ("🛡️  Control Objective", "Does the control mitigate the identified risk?"),
+    ("⚙️  Execution", "Is the automation level appropriate?"),
+    ("🏷️  Type Adequacy", "Detective vs Preventive classification"),
+    ("⏰ Frequency", "Is the operating frequency suitable?"),
+    ("🖥️  Dependencies", "What systems and tools are involved?"),
+    ("👥 Segregation", "Are duties properly separated?"),
+    ("📊 Overall Rating", "Effective, Partially Effective, or Ineffective"),
+    ("📋 Evidence", "What should auditors look for?")
+))
+_PREVIEW = "\n".join(f"   {dimension}: {description}" for dimension, description in _DIMENSIONS)
+
+def _is_utf(stream):
+    """True if the stream encodes text as UTF-8/16/32"""
+    return "utf" in (getattr(stream, "encoding", None) or "").lower()
+
+def print_banner():
+    """Display an attractive banner for the demo"""
+    print(_UNICODE_BANNER if _is_utf(sys.stdout) else _ASCII_BANNER)
+
+def setup_demo(api_key=None):
     """Set up the demo environment with comprehensive checks"""
+    global _sample_created
     print_banner()
-    print("� Performing environment validation...\n")
+    print("🔍 Performing environment validation...\n")
     
     # Check Python version
-    python_version = sys.version_info
-    if python_version < (3, 8):
+    major, minor = sys.version_info[:2]
+    if sys.hexversion < 0x03080000:
         print("❌ Python 3.8+ required. Current version:", 
-              f"{python_version.major}.{python_version.minor}")
+              f"{major}.{minor}")
         return False
-    print(f"✅ Python {python_version.major}.{python_version.minor} detected")
+    print(f"✅ Python {major}.{minor} detected")
     
-    # Check dependencies
-    required_packages = ['pandas', 'openpyxl', 'openai', 'httpx']
-    missing_packages = []
-    
-    for package in required_packages:
+    # Check OpenAI API key first: it is the cheapest check and the most common
+    # reason to stop, so bail out before probing packages or writing files
+    # (--api-key takes precedence over the environment)
+    if api_key:
+        os.environ["OPENAI_API_KEY"] = api_key
+    else:
         try:
-            __import__(package)
-            print(f"✅ {package} installed")
-        except ImportError:
-            missing_packages.append(package)
-            print(f"❌ {package} missing")
-    
-    if missing_packages:
-        print(f"\n⚠️  Missing packages: {', '.join(missing_packages)}")
-        print("Please install them with: pip install -r requirements.txt")
-        return False
-    
-    # Check OpenAI API key
-    api_key = os.getenv("OPENAI_API_KEY")
+            api_key = os.environ["OPENAI_API_KEY"]
+        except KeyError:
+            api_key = ""
     if not api_key:
         print("\n⚠️  OpenAI API key not found!")
         print("   Set your API key with:")
@@ -72,14 +238,27 @@ def setup_demo():
             print("   ⚠️  Continuing without API key (analysis will fail)")
             return False
     else:
-        masked_key = f"{api_key[:7]}...{api_key[-4:]}" if len(api_key) > 11 else "***"
+        masked_key = api_key[:7] + "..." + api_key[-4:] if len(api_key) > 11 else "***"
         print(f"✅ OpenAI API key found: {masked_key}")
     
+    # Check dependencies (find_spec locates packages without importing them;
+    # all entries are top-level names, so no parent package gets executed)
+    from importlib.util import find_spec
+    missing_packages = [package for package in REQUIRED_PACKAGES if find_spec(package) is None]
+    
+    for package in REQUIRED_PACKAGES:
+        print(_MISSING_MSG(package) if package in missing_packages else _OK_MSG(package))
+    
+    if missing_packages:
+        print(f"\n⚠️  Missing packages: {', '.join(missing_packages)}")
+        print("Please install them with: pip install -r requirements.txt")
+        return False
+    
     # Check if sample file exists
-    sample_file = Path("sample_controls.xlsx")
-    if not sample_file.exists():
+    if not os.path.isfile("sample_controls.xlsx"):
         print("\n📄 Sample file not found, creating one...")
         if create_sample_file():
+            _sample_created = True
             print("   ✅ Sample file created successfully")
         else:
             print("   ❌ Failed to create sample file")
@@ -88,44 +267,51 @@ def setup_demo():
         print("✅ Sample file 'sample_controls.xlsx' found")
     
     print("\n🎉 Demo environment ready!")
-    print("=" * 60)
+    print(_SEP)
     return True
 
 def create_sample_file():
-    """Create a comprehensive sample Excel file for demonstration"""
+    """
+    Create a comprehensive sample Excel file for demonstration
+    
+    The workbook holds plain values only (no formulas or styling), so it is
+    read back by the analysis through openpyxl's read_only/data_only mode.
+    """
+    # Only needed on this (rare) path, so kept out of demo startup
+    import base64
+    import io
+    import zipfile
+    
+    # Fast path: write the embedded workbook if its CRCs check out; the
+    # openpyxl writer below is only imported when that fails
     try:
-        import pandas as pd
-        
-        # Enhanced sample data with more realistic examples
-        data = {
-            'Risk': ['R001', 'R002', 'R003', 'R004'],
-            'Risk Description': [
-                'Risk of unauthorized access to sensitive financial data resulting in data breaches, fraud, or regulatory violations',
-                'Risk of erroneous financial reporting due to manual data entry errors, system glitches, and lack of validation controls', 
-                'Risk of incomplete expense approvals leading to unauthorized payments, budget overruns, and fraud',
-                'Risk of inadequate data backup and recovery procedures resulting in data loss during system failures or cyber attacks'
-            ],
-            'Control': ['C001', 'C002', 'C003', 'C004'],
-            'Control Description': [
-                'The IT Security Manager performs monthly comprehensive review of user access privileges including role verification, dormant account identification, access rights validation, and segregation of duties compliance in the SAP financial system',
-                'Automated system validation checks are performed in real-time on all financial entries with exception reporting to the Finance Manager, including data type validation, range checks, duplicate detection, and business rule verification',
-                'Department heads review and approve all expenses above $1,000 using digital approval workflow with dual authorization requirement, documented business justification, and budget availability verification',
-                'IT team performs weekly automated backups of critical financial data with monthly restore testing, quarterly disaster recovery drills, and annual business continuity plan review'
-            ],
-            'Automation': ['Manual', 'Automated', 'Semi-Auto', 'Automated'],
-            'Detective/ Preventive': ['Detective', 'Preventive', 'Preventive', 'Preventive'],
-            'Operation Frequency': ['Monthly', 'Real-time', 'As needed', 'Weekly']
-        }
-        
-        df = pd.DataFrame(data)
-        df.to_excel('sample_controls.xlsx', index=False, engine='openpyxl')
+        blob = base64.b64decode(_SAMPLE_XLSX_B64)
+        with zipfile.ZipFile(io.BytesIO(blob)) as archive:
+            valid = archive.testzip() is None
+    except (ValueError, zipfile.BadZipFile):
+        valid = False
+    
+    try:
+        if valid:
+            with open("sample_controls.xlsx", "wb") as f:
+                f.write(blob)
+        else:
+            # Imported here so openpyxl is only loaded when the sample must be built;
+            # write-only mode streams rows instead of building a Cell per value
+            from openpyxl import Workbook
+            wb = Workbook(write_only=True)
+            ws = wb.create_sheet("Sheet1")
+            ws.append(list(SAMPLE_DATA))
+            for row in zip(*SAMPLE_DATA.values()):
+                ws.append(list(row))
+            wb.save('sample_controls.xlsx')
         
-        print(f"   📊 Created {len(df)} sample controls")
-        print(f"   📋 Columns: {', '.join(df.columns)}")
+        print(f"   📊 Created {len(SAMPLE_DATA['Control'])} sample controls")
+        print(f"   📋 Columns: {', '.join(SAMPLE_DATA)}")
         return True
         
     except ImportError:
-        print("   ❌ pandas not installed. Please run: pip install pandas openpyxl")
+        print("   ❌ openpyxl not installed. Please run: pip install openpyxl")
         return False
     except Exception as e:
         print(f"   ❌ Error creating sample file: {e}")
@@ -133,52 +319,42 @@ def create_sample_file():
 
 def display_analysis_preview():
     """Show what the analysis will evaluate"""
-    print("\n🔍 ANALYSIS PREVIEW")
-    print("=" * 60)
-    print("The AI will evaluate each control across 9 dimensions:")
-    print()
-    
-    dimensions = [
-        ("🎯 Completeness", "6W Framework (Who, What, When, Where, Why, How)"),
-        ("🛡️  Control Objective", "Does the control mitigate the identified risk?"),
-        ("⚙️  Execution", "Is the automation level appropriate?"),
-        ("🏷️  Type Adequacy", "Detective vs Preventive classification"),
-        ("⏰ Frequency", "Is the operating frequency suitable?"),
-        ("🖥️  Dependencies", "What systems and tools are involved?"),
-        ("👥 Segregation", "Are duties properly separated?"),
-        ("📊 Overall Rating", "Effective, Partially Effective, or Ineffective"),
-        ("📋 Evidence", "What should auditors look for?")
-    ]
-    
-    for dimension, description in dimensions:
-        print(f"   {dimension}: {description}")
-    
-    print("\n📈 EXPECTED OUTPUT")
-    print("=" * 60)
-    print("📄 Excel report with:")
-    print("   • Color-coded completeness analysis")
-    print("   • Detailed AI explanations for each assessment")
-    print("   • Improvement suggestions for gaps")
-    print("   • Professional formatting and styling")
-    print("   • Expected evidence recommendations")
-
-def run_demo():
+    sys.stdout.write("\n".join((
+        "\n🔍 ANALYSIS PREVIEW",
+        _SEP,
+        "The AI will evaluate each control across 9 dimensions:",
+        "",
+        _PREVIEW,
+        "\n📈 EXPECTED OUTPUT",
+        _SEP,
+        "📄 Excel report with:",
+        "   • Color-coded completeness analysis",
+        "   • Detailed AI explanations for each assessment",
+        "   • Improvement suggestions for gaps",
+        "   • Professional formatting and styling",
+        "   • Expected evidence recommendations",
+        "",
+    )))
+    sys.stdout.flush()
+
+def run_demo(assume_yes=False, api_key=None):
     """Run the complete demonstration"""
-    if not setup_demo():
+    global _main_fn
+    if not setup_demo(api_key):
         print("\n❌ Demo setup failed. Please resolve the issues above.")
         return False
     
     display_analysis_preview()
     
     print("\n🚀 STARTING ANALYSIS")
-    print("=" * 60)
+    print(_SEP)
     
-    # Get user confirmation
-    while True:
-        response = input("\nProceed with AI analysis? (y/n): ").lower().strip()
-        if response in ['y', 'yes']:
+    # Get user confirmation (skipped with --yes)
+    while not assume_yes:
+        response = input("\nProceed with AI analysis? (y/n): ").strip().lower()
+        if response in _YES:
             break
-        elif response in ['n', 'no']:
+        elif response in _NO:
             print("Demo cancelled by user.")
             return True
         else:
@@ -190,23 +366,32 @@ def run_demo():
     print()
     
     try:
-        # Import and run the main analysis
-        from tod_control_testing_v21_enhanced import main
-        main()
+        # Import and run the main analysis (resolved once, reused on later runs)
+        if _main_fn is None:
+            from tod_control_testing_v21_enhanced import main as _main_fn
+        if _sample_created:
+            import pandas as pd  # already loaded by the analysis module
+            _main_fn(pd.DataFrame(SAMPLE_DATA))
+        else:
+            _main_fn()
         
-        print("\n" + "=" * 60)
-        print("🎉 DEMO COMPLETED SUCCESSFULLY!")
-        print("=" * 60)
-        print("📄 Results saved to: sample_controls_TestResult.xlsx")
-        print("📊 Open the file to see the detailed AI analysis")
-        print()
-        print("� Next Steps:")
-        print("   1. Review the analysis results in Excel")
-        print("   2. Examine the AI's reasoning and suggestions")
-        print("   3. Try with your own control data")
-        print("   4. Customize the analysis parameters if needed")
-        print()
-        print("🔗 Learn more: https://github.com/Mehulchhabra07/Automated-Test-of-Design---Internal-Controls")
+        sys.stdout.write("\n".join((
+            "\n" + _SEP,
+            "🎉 DEMO COMPLETED SUCCESSFULLY!",
+            _SEP,
+            "📄 Results saved to: sample_controls_TestResult.xlsx",
+            "📊 Open the file to see the detailed AI analysis",
+            "",
+            "💡 Next Steps:",
+            "   1. Review the analysis results in Excel",
+            "   2. Examine the AI's reasoning and suggestions",
+            "   3. Try with your own control data",
+            "   4. Customize the analysis parameters if needed",
+            "",
+            "🔗 Learn more: https://github.com/Mehulchhabra07/Automated-Test-of-Design---Internal-Controls",
+            "",
+        )))
+        sys.stdout.flush()
         
         return True
         
@@ -222,14 +407,38 @@ def run_demo():
         print("   • Check the logs in 'tod_analysis.log' for details")
         return False
 
-def main():
-    """Main demo function"""
+def _run():
+    """Parse the command line, run the demo and return the exit status"""
+    # On a non-UTF console (e.g. a legacy Windows code page) the emoji used in the
+    # status lines and the analysis log cannot be encoded; print them as "?"
+    # instead of failing with UnicodeEncodeError
+    for stream in (sys.stdout, sys.stderr):
+        if not _is_utf(stream) and hasattr(stream, "reconfigure"):
+            stream.reconfigure(errors="replace")
+    
+    import argparse
+    parser = argparse.ArgumentParser(description="AI-Powered TOD Control Analysis demo")
+    parser.add_argument("-y", "--yes", action="store_true",
+                        help="start the analysis without asking for confirmation")
+    parser.add_argument("--api-key", help="OpenAI API key to use instead of OPENAI_API_KEY")
+    args = parser.parse_args()
+    
     try:
-        success = run_demo()
-        sys.exit(0 if success else 1)
+        success = run_demo(assume_yes=args.yes, api_key=args.api_key)
+        return 0 if success else 1
     except KeyboardInterrupt:
         print("\n\n👋 Demo interrupted. Goodbye!")
-        sys.exit(1)
+        return 1
+
+def main():
+    """Main demo function"""
+    sys.exit(_run())
 
 if __name__ == "__main__":
-    main()
+    # Exit without interpreter teardown (atexit hooks, module cleanup) once the
+    # demo is done; it holds no resources that need finalizing. Importers
+    # should call main(), which exits normally.
+    status = _run()
+    sys.stdout.flush()
+    sys.stderr.flush()
+    os._exit(status)
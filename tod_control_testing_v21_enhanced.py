@@ -1,7 +1,7 @@
 """
 ------------------------------------------------------------------
 AI-Powered Test of Design (TOD) Control Analysis Tool
-requires : pandas  openpyxl  openai  httpx
+requires : pandas  openpyxl  xlsxwriter  openai  httpx  orjson
 ------------------------------------------------------------------
 An intelligent auditing framework that uses AI to analyze internal controls 
 for completeness and effectiveness. Features automated risk assessment, 
@@ -19,13 +19,22 @@ Project: AI-Driven Control Testing Framework
 
 from pathlib import Path
 from datetime import datetime
-import os, sys, json, time, re, logging
+from importlib.util import find_spec
+from dataclasses import dataclass, astuple, fields
+import os, sys, re, csv, time, queue, atexit, logging, asyncio, hashlib, sqlite3, functools
+from logging.handlers import QueueHandler, QueueListener
+import orjson
+import numpy as np
 import pandas as pd
 import httpx
-from openpyxl.utils import get_column_letter
-from openpyxl.styles import Font, Alignment
-from openai import OpenAI, OpenAIError
-from typing import Tuple, Optional, Dict, Any
+import xlsxwriter
+from openai import AsyncOpenAI, OpenAIError
+from typing import Tuple, Optional, Dict, Any, List, Mapping
+
+try:
+    import aiohttp
+except ImportError:  # Optional - chat calls fall back to the OpenAI SDK
+    aiohttp = None
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #                               CONFIGURATION
@@ -38,6 +47,10 @@ class Config:
     INPUT_FILE = Path("sample_controls.xlsx")  # Place your input file in the same directory
     OUTPUT_FILE = INPUT_FILE.with_name(f"{INPUT_FILE.stem}_TestResult.xlsx")
     
+    # Excel reader - "calamine" is much faster on large workbooks
+    # (requires: pip install python-calamine, pandas 2.2+)
+    EXCEL_ENGINE = "openpyxl"
+    
     # Input columns (exact headers in row‑1)
     CONTROL_COL = "Control"
     DESC_COL = "Control Description"
@@ -56,6 +69,20 @@ class Config:
         "gpt-4o", "gpt-4o-mini"
     ]
     
+    # Models that accept response_format={"type": "json_object"} (guaranteed valid JSON)
+    JSON_MODE_MODELS = ["gpt-4-turbo", "gpt-3.5-turbo", "gpt-4o", "gpt-4o-mini"]
+    
+    # Decoding settings - deterministic answers (which also keeps cached responses valid)
+    TEMPERATURE = 0
+    TOP_P = 1
+    SEED = 42
+    
+    # Output token caps per question type
+    MAX_TOKENS_ANSWER = 120        # Yes/No answer, rating or systems with a short explanation
+    MAX_TOKENS_COMPLETENESS = 400  # Present / missing / suggestions JSON
+    MAX_TOKENS_EVIDENCE = 400      # Numbered expected-evidence list
+    MAX_TOKENS_FULL = 1500         # Combined analysis (FUSE_QUESTIONS)
+    
     # Retry settings for robust error handling
     MAX_RETRIES = 5
     RETRY_DELAY = 1.0
@@ -64,6 +91,47 @@ class Config:
     # Request timeout settings
     REQUEST_TIMEOUT = 120.0
     
+    # Concurrency settings - LLM requests in flight at once (all rows and questions)
+    MAX_CONCURRENCY = 10
+    MAX_CONNECTIONS = 100
+    KEEPALIVE_EXPIRY = 60.0  # Seconds an idle connection stays open for reuse
+    # HTTP/2 for the OpenAI SDK client (pip install httpx[http2]). It only carries
+    # chat requests when DIRECT_HTTP is False; otherwise just the connection test,
+    # Batch API and embeddings calls
+    HTTP2 = True
+    
+    # Send chat requests straight to {BASE_URL}/chat/completions with aiohttp
+    # (HTTP/1.1 over a keep-alive pool of MAX_CONNECTIONS), which scales better at
+    # high concurrency; the SDK is still used for the connection test, the Batch
+    # API and embeddings
+    DIRECT_HTTP = True
+    
+    # Batch API - submit all prompts as offline batch jobs instead of live calls
+    # (half the token cost, no rate-limit pressure, results within 24 hours)
+    USE_BATCH_API = False
+    BATCH_POLL_INTERVAL = 30.0  # Seconds between batch status checks
+    
+    # Ask all nine questions for a control in one combined prompt (one request
+    # per row instead of nine); set False to send each question separately
+    FUSE_QUESTIONS = True
+    
+    # Response cache - answers are stored on disk and reused for identical
+    # requests (same model and prompt), including across runs
+    USE_CACHE = True
+    CACHE_FILE = Path(".tod_cache.sqlite")
+    
+    # Checkpoint - each finished control is appended here so an interrupted run
+    # resumes where it stopped; removed once the Excel report is saved
+    CHECKPOINT_FILE = OUTPUT_FILE.with_suffix(".partial.csv")
+    
+    # Near-duplicate controls - embed every Control Description in one request up
+    # front and analyze only one control per group of near-identical descriptions
+    # (with the same risk, automation, type and frequency); the rest copy its results
+    DEDUPE_SIMILAR = False
+    EMBEDDING_MODEL = "text-embedding-3-small"
+    EMBEDDING_BATCH_SIZE = 2048    # Max inputs per embeddings request
+    SIMILARITY_THRESHOLD = 0.95    # Cosine similarity needed to share results
+    
     # Required columns for validation
     REQUIRED_COLS = [
         "Risk", "Risk Description", "Control", "Control Description",
@@ -74,26 +142,49 @@ class Config:
 #                               LOGGING SETUP
 # ═══════════════════════════════════════════════════════════════════════════════
 
+_log_listener: Optional[QueueListener] = None
+
 def setup_logging():
-    """Setup logging configuration"""
-    logging.basicConfig(
-        level=logging.INFO,
-        format='%(asctime)s - %(levelname)s - %(message)s',
-        handlers=[
-            logging.FileHandler('tod_analysis.log'),
-            logging.StreamHandler(sys.stdout)
-        ]
-    )
+    """
+    Setup logging configuration
+    
+    Log calls only put the record on a queue; a background thread writes it to
+    the log file and the console, so the event loop never waits on log I/O.
+    """
+    global _log_listener
+    formatter = logging.Formatter('%(asctime)s - %(levelname)s - %(message)s')
+    handlers = [
+        logging.FileHandler('tod_analysis.log'),
+        logging.StreamHandler(sys.stdout)
+    ]
+    for handler in handlers:
+        handler.setFormatter(formatter)
+    
+    log_queue = queue.SimpleQueue()
+    queue_handler = QueueHandler(log_queue)
+    # The listener's handlers add the timestamp and level
+    queue_handler.setFormatter(logging.Formatter('%(message)s'))
+    logging.basicConfig(level=logging.INFO, handlers=[queue_handler])
+    
+    _log_listener = QueueListener(log_queue, *handlers)
+    _log_listener.start()
+    atexit.register(_log_listener.stop)
     return logging.getLogger(__name__)
 
+def flush_logging():
+    """Wait until every queued log record has been written"""
+    _log_listener.stop()
+    _log_listener.start()
+
 logger = setup_logging()
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #                               API CLIENT SETUP
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def initialize_client() -> OpenAI:
+async def initialize_client() -> AsyncOpenAI:
     """Initialize and test OpenAI client with robust error handling"""
+    global _rate_limiter
     if Config.API_KEY == "YOUR_OPENAI_API_KEY_HERE":
         logger.error("⚠  Set OPENAI_API_KEY environment variable or update Config.API_KEY")
         sys.exit(1)
@@ -106,12 +197,23 @@ def initialize_client() -> OpenAI:
     logger.info(f"Initializing OpenAI client with model: {Config.MODEL}")
     logger.info(f"Base URL: {Config.BASE_URL}")
 
-    client = OpenAI(
+    # HTTP/2 needs the optional h2 package; fall back to HTTP/1.1 keep-alive without it
+    http2 = Config.HTTP2 and find_spec("h2") is not None
+    if Config.HTTP2 and not http2:
+        logger.warning("⚠ HTTP/2 unavailable - install it with: pip install httpx[http2]")
+
+    client = AsyncOpenAI(
         api_key=Config.API_KEY,
         base_url=Config.BASE_URL,
-        http_client=httpx.Client(
+        http_client=httpx.AsyncClient(
+            http2=http2,
             verify=True,  # Enable SSL verification for standard OpenAI API
-            timeout=Config.REQUEST_TIMEOUT
+            timeout=Config.REQUEST_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=Config.MAX_CONNECTIONS,
+                max_keepalive_connections=Config.MAX_CONNECTIONS,
+                keepalive_expiry=Config.KEEPALIVE_EXPIRY
+            )
         )
     )
 
@@ -119,7 +221,7 @@ def initialize_client() -> OpenAI:
     for attempt in range(Config.MAX_RETRIES):
         try:
             logger.info(f"Testing connection (attempt {attempt + 1}/{Config.MAX_RETRIES})...")
-            response = client.chat.completions.create(
+            raw_response = await client.chat.completions.with_raw_response.create(
                 model=Config.MODEL,
                 messages=[
                     {"role": "system", "content": "Be concise and precise."},
@@ -127,6 +229,11 @@ def initialize_client() -> OpenAI:
                 ],
                 max_tokens=10
             )
+            response = raw_response.parse()
+            
+            # Seed the shared rate limiter with the account's current budget
+            _rate_limiter = RateLimiter()
+            _rate_limiter.update(raw_response.headers)
             
             if response and response.choices and response.choices[0].message.content:
                 logger.info("✔ OpenAI API connection test successful")
@@ -143,7 +250,7 @@ def initialize_client() -> OpenAI:
             if "429" in error_msg or "too many requests" in error_msg:
                 wait_time = min(Config.RETRY_DELAY * (2 ** attempt), Config.MAX_RETRY_DELAY)
                 logger.info(f"Rate limit hit, waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
+                await asyncio.sleep(wait_time)
             elif "401" in error_msg or "unauthorized" in error_msg:
                 logger.error("🚫 Authentication failed - check your API key")
                 sys.exit(1)
@@ -153,7 +260,7 @@ def initialize_client() -> OpenAI:
             elif attempt < Config.MAX_RETRIES - 1:
                 wait_time = Config.RETRY_DELAY * (2 ** attempt)
                 logger.info(f"Retrying in {wait_time}s...")
-                time.sleep(wait_time)
+                await asyncio.sleep(wait_time)
             else:
                 logger.error(f"🚫 All connection attempts failed. Last error: {e}")
                 logger.error("Please check:")
@@ -166,52 +273,316 @@ def initialize_client() -> OpenAI:
     logger.error("🚫 OpenAI API connection could not be established")
     sys.exit(1)
 
+# Direct HTTP session for chat completions (see open_http_session); None when
+# the calls go through the OpenAI SDK
+_http_session: Optional["aiohttp.ClientSession"] = None
+
+class ChatHTTPError(Exception):
+    """Error status returned by a direct chat completion request"""
+    
+    def __init__(self, status: int, body: bytes, headers: Mapping[str, str]):
+        super().__init__(f"Error code: {status} - {body[:500].decode('utf-8', 'replace')}")
+        self.status = status
+        self.headers = headers
+
+def open_http_session() -> None:
+    """Create the aiohttp session used for chat completions when Config.DIRECT_HTTP is set"""
+    global _http_session
+    if not Config.DIRECT_HTTP or Config.USE_BATCH_API:
+        return
+    if aiohttp is None:
+        logger.warning("⚠ aiohttp not installed - sending requests through the OpenAI SDK (pip install aiohttp)")
+        return
+    _http_session = aiohttp.ClientSession(
+        connector=aiohttp.TCPConnector(limit=Config.MAX_CONNECTIONS, keepalive_timeout=Config.KEEPALIVE_EXPIRY),
+        timeout=aiohttp.ClientTimeout(total=Config.REQUEST_TIMEOUT),
+        headers={"Authorization": f"Bearer {Config.API_KEY}", "Content-Type": "application/json"},
+    )
+
+async def close_http_session() -> None:
+    """Close the direct HTTP session"""
+    global _http_session
+    if _http_session is not None:
+        await _http_session.close()
+        _http_session = None
+
+async def post_chat_completion(body: Dict[str, Any]) -> Tuple[str, Mapping[str, str]]:
+    """POST a chat request to {BASE_URL}/chat/completions; returns the message content and response headers"""
+    async with _http_session.post(f"{Config.BASE_URL}/chat/completions", data=orjson.dumps(body)) as response:
+        payload = await response.read()
+        if response.status >= 400:
+            raise ChatHTTPError(response.status, payload, response.headers)
+        return orjson.loads(payload)["choices"][0]["message"]["content"], response.headers
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                               UTILITY FUNCTIONS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-BRACE_RE = re.compile(r"\{.*\}", re.S)
+def find_json_object(text: str) -> Optional[str]:
+    """Return the first balanced {...} block in text, ignoring braces inside string literals"""
+    start = text.find("{")
+    if start == -1:
+        return None
+    
+    depth = 0
+    in_string = escaped = False
+    for i in range(start, len(text)):
+        ch = text[i]
+        if in_string:
+            if escaped:
+                escaped = False
+            elif ch == "\\":
+                escaped = True
+            elif ch == '"':
+                in_string = False
+        elif ch == '"':
+            in_string = True
+        elif ch == "{":
+            depth += 1
+        elif ch == "}":
+            depth -= 1
+            if depth == 0:
+                return text[start:i + 1]
+    return None
 
 def extract_json_from_response(raw_response: str) -> Optional[Dict[str, Any]]:
     """Extract JSON from LLM response with robust error handling"""
     try:
-        # Clean up response
-        if raw_response.lower().startswith("json"):
-            raw_response = raw_response[4:].strip()
+        # JSON mode and well-behaved models return the bare object
+        try:
+            data = orjson.loads(raw_response)
+            if isinstance(data, dict):
+                return data
+        except orjson.JSONDecodeError:
+            pass
         
-        # Try to find JSON in response
-        match = BRACE_RE.search(raw_response)
-        json_str = match.group(0) if match else raw_response
+        # Otherwise pick the object out of surrounding text or code fences
+        json_str = find_json_object(raw_response) or raw_response
         
-        return json.loads(json_str)
-    except json.JSONDecodeError as e:
+        data = orjson.loads(json_str)
+        return data if isinstance(data, dict) else None
+    except orjson.JSONDecodeError as e:
         logger.warning(f"Failed to parse JSON response: {e}")
         return None
     except Exception as e:
         logger.warning(f"Unexpected error parsing response: {e}")
         return None
 
-def make_llm_call_with_retry(client: OpenAI, prompt: str, system_content: str = "Respond only with the JSON object.") -> Optional[str]:
+DURATION_RE = re.compile(r"(\d+(?:\.\d+)?)(ms|s|m|h)")
+_DURATION_UNITS = {"ms": 0.001, "s": 1.0, "m": 60.0, "h": 3600.0}
+
+def parse_reset_duration(value: str) -> float:
+    """Convert an x-ratelimit-reset-* value such as '6m0s' or '20ms' to seconds"""
+    return sum(float(amount) * _DURATION_UNITS[unit] for amount, unit in DURATION_RE.findall(value))
+
+class LeakyBucket:
+    """Per-minute budget (requests or tokens) that refills continuously up to its limit"""
+    
+    def __init__(self):
+        self.capacity: Optional[float] = None  # Unknown until a response reports the limit
+        self.level = 0.0
+        self.updated = time.monotonic()
+    
+    def refill(self, now: float) -> None:
+        if self.capacity is not None:
+            self.level = min(self.capacity, self.level + (now - self.updated) * self.capacity / 60.0)
+        self.updated = now
+    
+    def sync(self, limit: str, remaining: str, now: float) -> None:
+        """Adopt the limit and remaining budget reported by the API"""
+        self.refill(now)
+        first = self.capacity is None
+        self.capacity = float(limit)
+        # Requests sent after the server produced these figures are already deducted
+        # locally, so the server's count may only lower the level
+        self.level = float(remaining) if first else min(self.level, float(remaining))
+    
+    def wait_time(self, amount: float, now: float) -> float:
+        """Seconds until `amount` is available (a request above the whole limit waits for a full bucket)"""
+        if self.capacity is None:
+            return 0.0
+        self.refill(now)
+        amount = min(amount, self.capacity)
+        return max(0.0, (amount - self.level) * 60.0 / self.capacity)
+    
+    def take(self, amount: float) -> None:
+        if self.capacity is not None:
+            self.level -= amount
+
+class RateLimiter:
+    """
+    Client-side RPM/TPM scheduler driven by OpenAI's x-ratelimit-* headers.
+    
+    Each call reserves one request and its estimated tokens before it is sent
+    and waits for the buckets to refill when the budget is used up, so calls
+    are paced under the account limits instead of running into 429 errors.
+    """
+    
+    def __init__(self):
+        self.requests = LeakyBucket()
+        self.tokens = LeakyBucket()
+        self._lock = asyncio.Lock()
+    
+    def update(self, headers: Mapping[str, str]) -> None:
+        """Sync both buckets with the limits reported by a response"""
+        now = time.monotonic()
+        for bucket, kind in ((self.requests, "requests"), (self.tokens, "tokens")):
+            limit = headers.get(f"x-ratelimit-limit-{kind}")
+            remaining = headers.get(f"x-ratelimit-remaining-{kind}")
+            if limit and remaining:
+                bucket.sync(limit, remaining, now)
+    
+    async def acquire(self, tokens: int) -> None:
+        """Wait until a request of about `tokens` tokens fits in the budget, then reserve it"""
+        # Held while sleeping so waiting calls are released in order
+        async with self._lock:
+            now = time.monotonic()
+            delay = max(self.requests.wait_time(1, now), self.tokens.wait_time(tokens, now))
+            if delay > 0:
+                logger.debug(f"Rate limit budget used up, waiting {delay:.2f}s")
+                await asyncio.sleep(delay)
+                now = time.monotonic()
+                self.requests.refill(now)
+                self.tokens.refill(now)
+            self.requests.take(1)
+            self.tokens.take(tokens)
+    
+    def retry_after(self, headers: Mapping[str, str]) -> Optional[float]:
+        """Seconds until the exhausted limit behind a 429 resets, if the headers say so"""
+        self.update(headers)
+        waits = [
+            parse_reset_duration(headers.get(f"x-ratelimit-reset-{kind}", ""))
+            for kind in ("requests", "tokens")
+            if headers.get(f"x-ratelimit-remaining-{kind}") == "0"
+        ]
+        return max(waits) if waits else None
+
+def estimate_tokens(body: Dict[str, Any]) -> int:
+    """Rough TPM cost of a request: about 4 characters per prompt token, plus max_tokens"""
+    chars = sum(len(message["content"]) for message in body["messages"])
+    return chars // 4 + body.get("max_tokens", 0)
+
+# Shared request/token budget; created by initialize_client from the ping's headers
+_rate_limiter: Optional[RateLimiter] = None
+
+# Limits are per model, so embedding calls keep their own budget, seeded by
+# the first embeddings response; created by make_embedding_call_with_retry
+_embedding_rate_limiter: Optional[RateLimiter] = None
+
+# Bounds the number of LLM requests in flight; created by process_controls
+# inside the running event loop
+_llm_semaphore: Optional[asyncio.Semaphore] = None
+
+# Batch API mode (see run_batch_analysis): answers fetched from completed
+# batches, and requests still waiting to be submitted, keyed by request_key.
+# Both are None when calls go to the API directly.
+_batch_responses: Optional[Dict[str, Optional[str]]] = None
+_batch_pending: Optional[Dict[str, Dict[str, Any]]] = None
+
+# Response cache (see open_response_cache), None when caching is disabled
+_response_cache: Optional[sqlite3.Connection] = None
+
+def open_response_cache() -> None:
+    """Open the on-disk response cache, creating it if needed"""
+    global _response_cache
+    if not Config.USE_CACHE or _response_cache is not None:
+        return
+    _response_cache = sqlite3.connect(Config.CACHE_FILE)
+    _response_cache.execute("PRAGMA journal_mode=WAL")
+    _response_cache.execute("CREATE TABLE IF NOT EXISTS responses (key TEXT PRIMARY KEY, response TEXT)")
+
+def close_response_cache() -> None:
+    """Close the response cache"""
+    global _response_cache
+    if _response_cache is not None:
+        _response_cache.close()
+        _response_cache = None
+
+def cached_response(key: str) -> Optional[str]:
+    """Return the stored response for a request key, if any"""
+    if _response_cache is None:
+        return None
+    row = _response_cache.execute("SELECT response FROM responses WHERE key = ?", (key,)).fetchone()
+    return row[0] if row else None
+
+def store_response(key: str, response: str) -> None:
+    """Save a response for reuse by identical requests"""
+    if _response_cache is not None:
+        with _response_cache:
+            _response_cache.execute("INSERT OR REPLACE INTO responses VALUES (?, ?)", (key, response))
+
+def build_chat_request(prompt: str, json_response: bool = True, max_tokens: Optional[int] = None) -> Dict[str, Any]:
+    """Build the chat completion request body shared by live and batch calls"""
+    body = {
+        "model": Config.MODEL,
+        "messages": [
+            # Same system prompt on every call so the API can serve it from its prompt cache
+            {"role": "system", "content": SYSTEM_PROMPT},
+            {"role": "user", "content": prompt}
+        ],
+        "temperature": Config.TEMPERATURE,
+        "top_p": Config.TOP_P,
+        "seed": Config.SEED,
+    }
+    if max_tokens:
+        body["max_tokens"] = max_tokens
+    if json_response and Config.MODEL in Config.JSON_MODE_MODELS:
+        body["response_format"] = {"type": "json_object"}
+    return body
+
+def request_key(body: Dict[str, Any]) -> str:
+    """Stable identifier for a chat completion request"""
+    return hashlib.sha256(orjson.dumps(body, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+async def make_llm_call_with_retry(client: AsyncOpenAI, prompt: str, json_response: bool = True,
+                                   max_tokens: Optional[int] = None) -> Optional[str]:
     """Make LLM call with retry logic and error handling"""
+    body = build_chat_request(prompt, json_response, max_tokens)
+    key = request_key(body)
+    
+    cached = cached_response(key)
+    if cached is not None:
+        return cached
+    
+    # Batch mode: answer from a completed batch, or queue for the next one
+    if _batch_pending is not None:
+        if key in _batch_responses:
+            response = _batch_responses[key]
+            if response is not None:
+                store_response(key, response)
+            return response
+        _batch_pending[key] = body
+        return None
+    
     for attempt in range(Config.MAX_RETRIES):
         try:
-            response = client.chat.completions.create(
-                model=Config.MODEL,
-                messages=[
-                    {"role": "system", "content": system_content},
-                    {"role": "user", "content": prompt}
-                ],
-            )
-            return response.choices[0].message.content.strip()
+            if _rate_limiter is not None:
+                await _rate_limiter.acquire(estimate_tokens(body))
+            # Only the request itself holds a slot; backoff sleeps below do not
+            async with _llm_semaphore:
+                if _http_session is not None:
+                    content, headers = await post_chat_completion(body)
+                else:
+                    raw_response = await client.chat.completions.with_raw_response.create(**body)
+                    content, headers = raw_response.parse().choices[0].message.content, raw_response.headers
+            if _rate_limiter is not None:
+                _rate_limiter.update(headers)
+            content = content.strip()
+            store_response(key, content)
+            return content
         except Exception as e:
             error_msg = str(e).lower()
             logger.warning(f"LLM call attempt {attempt + 1} failed: {e}")
             
             # Handle specific error types
             if "429" in error_msg or "too many requests" in error_msg:
-                wait_time = min(Config.RETRY_DELAY * (2 ** attempt), Config.MAX_RETRY_DELAY)
+                # Wait exactly until the exhausted limit resets when the 429 says when that is
+                headers = getattr(e, "headers", None) or getattr(getattr(e, "response", None), "headers", None)
+                wait_time = _rate_limiter.retry_after(headers) if _rate_limiter and headers is not None else None
+                if wait_time is None:
+                    wait_time = min(Config.RETRY_DELAY * (2 ** attempt), Config.MAX_RETRY_DELAY)
                 logger.info(f"Rate limit hit, waiting {wait_time}s before retry...")
-                time.sleep(wait_time)
+                await asyncio.sleep(wait_time)
             elif "401" in error_msg or "unauthorized" in error_msg:
                 logger.error("🚫 Authentication failed during LLM call")
                 return None
@@ -221,16 +592,208 @@ def make_llm_call_with_retry(client: OpenAI, prompt: str, system_content: str =
             elif attempt < Config.MAX_RETRIES - 1:
                 wait_time = Config.RETRY_DELAY * (2 ** attempt)  # Exponential backoff
                 logger.info(f"Retrying LLM call in {wait_time}s...")
-                time.sleep(wait_time)
+                await asyncio.sleep(wait_time)
             else:
                 logger.error(f"All {Config.MAX_RETRIES} LLM call attempts failed")
     return None
 
+async def make_embedding_call_with_retry(client: AsyncOpenAI, texts: List[str]) -> Optional[List[List[float]]]:
+    """Embed texts with the same retry logic as chat calls, paced by the embedding model's own limits"""
+    global _embedding_rate_limiter
+    if _embedding_rate_limiter is None:
+        _embedding_rate_limiter = RateLimiter()
+    
+    for attempt in range(Config.MAX_RETRIES):
+        try:
+            await _embedding_rate_limiter.acquire(sum(len(text) for text in texts) // 4)
+            raw_response = await client.embeddings.with_raw_response.create(
+                model=Config.EMBEDDING_MODEL, input=texts
+            )
+            _embedding_rate_limiter.update(raw_response.headers)
+            return [item.embedding for item in raw_response.parse().data]
+        except Exception as e:
+            error_msg = str(e).lower()
+            logger.warning(f"Embedding call attempt {attempt + 1} failed: {e}")
+            
+            if "429" in error_msg or "too many requests" in error_msg:
+                headers = getattr(e, "headers", None) or getattr(getattr(e, "response", None), "headers", None)
+                wait_time = _embedding_rate_limiter.retry_after(headers) if headers is not None else None
+                if wait_time is None:
+                    wait_time = min(Config.RETRY_DELAY * (2 ** attempt), Config.MAX_RETRY_DELAY)
+                logger.info(f"Rate limit hit, waiting {wait_time}s before retry...")
+                await asyncio.sleep(wait_time)
+            elif "401" in error_msg or "unauthorized" in error_msg or "404" in error_msg or "not found" in error_msg:
+                return None
+            elif attempt < Config.MAX_RETRIES - 1:
+                wait_time = Config.RETRY_DELAY * (2 ** attempt)
+                logger.info(f"Retrying embedding call in {wait_time}s...")
+                await asyncio.sleep(wait_time)
+            else:
+                logger.error(f"All {Config.MAX_RETRIES} embedding call attempts failed")
+    return None
+
+# ═══════════════════════════════════════════════════════════════════════════════
+#                               ROW RESULTS
+# ═══════════════════════════════════════════════════════════════════════════════
+
+@dataclass
+class RowResult:
+    """Analysis results for one control; any field not filled in reads "Processing error" """
+    present: str = "Processing error"
+    missing: str = "Processing error"
+    suggestions: str = "Processing error"
+    present_missing: str = "Processing error"
+    objective_ans: str = "Processing error"
+    objective_exp: str = "Processing error"
+    execution_ans: str = "Processing error"
+    execution_exp: str = "Processing error"
+    type_ans: str = "Processing error"
+    type_exp: str = "Processing error"
+    frequency_ans: str = "Processing error"
+    frequency_exp: str = "Processing error"
+    systems_ans: str = "Processing error"
+    systems_exp: str = "Processing error"
+    adaptability_ans: str = "Processing error"
+    adaptability_exp: str = "Processing error"
+    overall_rating_ans: str = "Processing error"
+    overall_rating_exp: str = "Processing error"
+    expected_evidence: str = "Processing error"
+
+# Report column for each RowResult field (same order and headers as original)
+RESULT_COLUMNS = {
+    "present_missing": "Has the control been formally documented? (When, Why, Who, What, Where and How)",
+    "suggestions": "Suggestions",
+    "objective_ans": "Control objective: Is the control designed able to mitigate the risk ?",
+    "objective_exp": "Control objective: Explanation",
+    "execution_ans": "Is the control execution appropriate for the risk being addressed?",
+    "execution_exp": "Execution appropriateness: Explanation",
+    "type_ans": "Is the control type adequate for the risk it addresses",
+    "type_exp": "Type adequacy: Explanation",
+    "frequency_ans": "Is the control frequency appropriate for the associated risk?",
+    "frequency_exp": "Frequency appropriateness: Explanation",
+    "systems_ans": "System/data dependencies: Are the systems/data sources used reliable and secure?",
+    "adaptability_ans": "Adaptability - Is the control adaptable to new risks or process changes?",
+    "adaptability_exp": "Adaptability: Explanation",
+    "overall_rating_ans": "Overall Rating",
+    "overall_rating_exp": "Overall Rating: Explanation",
+    "expected_evidence": "Potential Evidences Expected Based on Control Description",
+}
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                               ANALYSIS FUNCTIONS
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def ask_llm(client: OpenAI, text: str) -> Tuple[str, str, str]:
+# Answers to questions that depend only on the control description, keyed by
+# (question, normalized description); reset by process_controls on every run
+_description_memo: Dict[Tuple[str, str], asyncio.Future] = {}
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+def memoize_by_description(func):
+    """Ask once per distinct control description (ignoring case and spacing) and share the answer"""
+    @functools.wraps(func)
+    def wrapper(client: AsyncOpenAI, control_desc: str) -> asyncio.Future:
+        key = (func.__name__, WHITESPACE_RE.sub(" ", str(control_desc).strip().lower()))
+        if key not in _description_memo:
+            # A task, not a coroutine, so rows still waiting on the first call can await it too
+            _description_memo[key] = asyncio.ensure_future(func(client, control_desc))
+        return _description_memo[key]
+    return wrapper
+
+# Shared system prompt holding the whole rubric. It is identical for every call
+# and longer than 1024 tokens, so OpenAI's automatic prompt caching serves it
+# from cache after the first request; the user message only names the task and
+# carries the control's fields.
+SYSTEM_PROMPT = f"""
+You are the world's best professional auditor with decades of experience testing the design of internal controls (Test of Design, TOD) for SOX, ITGC and operational control frameworks.
+
+Each request starts with a line TASK=<name> followed by the inputs for that task, taken from one row of a risk and control matrix. Perform exactly the task named, using only the information provided, and answer in the output format defined for it below. Do not add commentary, greetings or markdown around the answer.
+
+GENERAL RULES
+- Judge the control as it is described. Do not assume procedures, owners, systems or evidence that the description does not mention.
+- A control is well designed when a competent reviewer could perform it consistently from the description alone and it would prevent or detect the risk in a timely manner.
+- Keep every explanation to 1-2 sentences and refer to the wording of the description.
+- Yes/No answers are exactly "Yes" or "No".
+- For JSON tasks, respond only with one valid JSON object matching the schema given for the task.
+
+THE 6W FRAMEWORK (completeness elements: {", ".join(Config.ELEMENTS)})
+- Who: the role, team or function that performs the control (e.g., "IT Security Manager", "AP supervisor"). A named system performing an automated control also counts.
+- What: the activity performed - the review, reconciliation, approval, validation or check, and the population it covers.
+- When: the timing or frequency of performance (e.g., daily, monthly, within 5 days of period end, before posting).
+- Where: the system, application, report, tool or location in which the control is performed or its evidence is kept.
+- Why: the objective or risk the control addresses (e.g., to prevent unauthorized access, to detect duplicate payments).
+- How: the method - criteria, thresholds, steps, follow-up and resolution of exceptions, and how the performance is evidenced.
+
+CONTROL ATTRIBUTES
+- Automation: Automated (performed entirely by a system), Semi-Auto (system-supported with a manual review or decision) or Manual (performed by people).
+- Type: Preventive controls stop an error or irregularity before it occurs; Detective controls identify it after the fact so it can be corrected.
+- Frequency: how often the control operates (e.g., Real-time, Daily, Weekly, Monthly, Quarterly, Annually, As needed). It is appropriate when it is often enough, relative to the volume and timing of the underlying transactions, to catch the risk before it causes a material issue.
+
+TASKS
+
+TASK=completeness
+Inputs: Control Description.
+Evaluate the control description for the presence of the six key elements. For each element:
+- If present, list it with a short clause (<20 words) referencing how it's reflected in the description.
+- If missing, explain briefly why it's considered missing (e.g., "no timeline or frequency mentioned").
+Then suggest improvements for each missing element based on the description.
+Output JSON: {{"present": {{"Who": "...", "What": "...", ...}}, "missing": {{"When": "No timeline stated", "Where": "No tool or system mentioned", ...}}, "suggestions": {{"When": "Suggest adding a specific timeline or frequency for review", ...}}}}
+
+TASK=objective
+Inputs: Risk Description, Control Description.
+Is the control, as designed, able to mitigate the risk? (Yes/No)
+Output JSON: {{"answer": "Yes or No", "explanation": "..."}}
+
+TASK=execution
+Inputs: Automation, Risk Description, Control Description.
+Given the automation type (Automated/Semi-Auto/Manual), is the control execution appropriate based on the control description and risk description? (Yes/No)
+Output JSON: {{"answer": "Yes or No", "explanation": "..."}}
+
+TASK=type
+Inputs: Type, Risk Description, Control Description.
+Given the control type (Detective/Preventive), is the control type appropriate based on the control description and adequate for the risk it addresses? (Yes/No)
+Output JSON: {{"answer": "Yes or No", "explanation": "..."}}
+
+TASK=frequency
+Inputs: Frequency, Risk Description, Control Description.
+Is the control frequency appropriate based on the control description and adequate for the associated risk? (Yes/No)
+Output JSON: {{"answer": "Yes or No", "explanation": "..."}}
+
+TASK=systems
+Inputs: Control Description.
+Extract the names of any systems or data sources mentioned. List only the system or data source names (comma-separated if more than one). If none are mentioned, return "None found".
+Output JSON: {{"systems": "..."}}
+
+TASK=sod
+Inputs: Control Description.
+Does the control ensure that no single individual has end-to-end responsibility for critical transactions, i.e. proper segregation of duties? (Yes/No)
+Output JSON: {{"answer": "Yes or No", "explanation": "..."}}
+
+TASK=overall
+Inputs: the answers already given for the control objective, execution appropriateness, type adequacy, frequency appropriateness and system/data dependencies, plus the present and missing completeness elements.
+Provide an overall rating as one of the following: Effective, Partially effective, In-effective. Rate Effective when the control mitigates the risk and its execution, type and frequency are appropriate with no significant elements missing; Partially effective when it addresses the risk but has gaps in design or documentation; In-effective when it does not mitigate the risk.
+Output JSON: {{"rating": "Effective, Partially effective, or In-effective", "explanation": "..."}}
+
+TASK=evidence
+Inputs: Control Description.
+List the types of evidence an auditor or tester would expect to see to verify the control's operation (e.g., signed review checklists, system reports with reviewer sign-off, approval logs, reconciliations with supporting documentation, tickets showing exception follow-up).
+Output: a numbered list of expected evidence types only, one per line (1., 2., 3., etc.), with no JSON and no other text.
+
+TASK=full
+Inputs: Risk Description, Control Description, Automation, Type, Frequency.
+Perform all of the tasks above for the control in one answer. Use the same rules as each individual task; the overall rating considers all the other answers.
+Output JSON: {{"present": {{...}}, "missing": {{...}}, "suggestions": {{...}}, "objective": {{"answer": "Yes or No", "explanation": "..."}}, "execution": {{"answer": "...", "explanation": "..."}}, "type": {{"answer": "...", "explanation": "..."}}, "frequency": {{"answer": "...", "explanation": "..."}}, "systems": "...", "sod": {{"answer": "...", "explanation": "..."}}, "overall": {{"rating": "Effective, Partially effective, or In-effective", "explanation": "..."}}, "evidence": "1. ...\\n2. ..."}}
+""".strip()
+
+def task_prompt(task: str, inputs: Dict[str, Any]) -> str:
+    """User message for one task: the TASK line and the row's inputs (the instructions are in SYSTEM_PROMPT)"""
+    return "\n\n".join([f"TASK={task}"] + [f"{name}:\n{value}" for name, value in inputs.items()])
+
+def bullet_list(items: Dict[str, str]) -> str:
+    """Format element -> comment pairs as bullet lines"""
+    return "\n".join([f"• {k}: {v}" for k, v in items.items()])
+
+async def ask_llm(client: AsyncOpenAI, text: str) -> Tuple[str, str, str]:
     """
     Core AI analysis function that evaluates control descriptions for completeness.
     
@@ -244,42 +807,9 @@ def ask_llm(client: OpenAI, text: str) -> Tuple[str, str, str]:
     Returns:
         Tuple containing (present_elements, missing_elements, suggestions)
     """
-    prompt = f"""
-You are the world's best professional auditor with decades of experience testing control descriptions for completeness.
-
-Given the following control description, evaluate it for the presence of six key elements: {", ".join(Config.ELEMENTS)}.
-
-For each element:
-- If present, list it with a short clause (<20 words) referencing how it's reflected in the description.
-- If missing, explain briefly why it's considered missing (e.g., "no timeline or frequency mentioned").
-
-Then suggest improvements for each missing element based on the description.
-
-Return valid JSON in this format:
-{{
-  "present": {{
-    "Who": "...",
-    "What": "...",
-    ...
-  }},
-  "missing": {{
-    "When": "No timeline stated",
-    "Where": "No tool or system mentioned",
-    ...
-  }},
-  "suggestions": {{
-    "When": "Suggest adding a specific timeline or frequency for review",
-    ...
-  }}
-}}
-
-Control Description:
-\"\"\"{text}\"\"\"
-
-JSON:
-"""
+    prompt = task_prompt("completeness", {"Control Description": f'"""{text}"""'})
 
-    raw_response = make_llm_call_with_retry(client, prompt)
+    raw_response = await make_llm_call_with_retry(client, prompt, max_tokens=Config.MAX_TOKENS_COMPLETENESS)
     if not raw_response:
         return "", "LLM error", ""
     
@@ -291,32 +821,29 @@ JSON:
     missing = data.get("missing", {})
     suggestions = data.get("suggestions", {})
 
-    present_str = "\n".join([f"• {k}: {v}" for k, v in present.items()])
-    missing_str = "\n".join([f"• {k}: {v}" for k, v in missing.items()])
-    suggestions_str = "\n".join([f"• {k}: {v}" for k, v in suggestions.items()])
-
-    return present_str, missing_str, suggestions_str
-
-def ask_control_objective(client: OpenAI, risk_desc: str, control_desc: str) -> Tuple[str, str]:
-    """Assess if control is designed to mitigate the risk"""
-    prompt = f"""
-Given the following risk description and control description, answer:
-1. Is the control, as designed, able to mitigate the risk? (Yes/No)
-2. Briefly explain your reasoning (1-2 sentences).
-
-Risk Description:
-{risk_desc}
-
-Control Description:
-{control_desc}
-
-Respond in JSON:
-{{
-  "answer": "Yes or No",
-  "explanation": "..."
-}}
-"""
-    raw_response = make_llm_call_with_retry(client, prompt)
+    return bullet_list(present), bullet_list(missing), bullet_list(suggestions)
+
+# Yes/No questions in the order they are asked: task -> (label, input column)
+# for each input sent with it. The user message for each task is laid out once
+# here, with a {} slot per input, so a call only fills in the row's values.
+YES_NO_QUESTIONS = {
+    "objective": (("Risk Description", "Risk Description"), ("Control Description", "Control Description")),
+    "execution": (("Automation", "Automation"), ("Risk Description", "Risk Description"),
+                  ("Control Description", "Control Description")),
+    "type": (("Type", "Detective/ Preventive"), ("Risk Description", "Risk Description"),
+             ("Control Description", "Control Description")),
+    "frequency": (("Frequency", "Operation Frequency"), ("Risk Description", "Risk Description"),
+                  ("Control Description", "Control Description")),
+    "sod": (("Control Description", "Control Description"),),
+}
+YES_NO_TEMPLATES = {
+    task: task_prompt(task, {label: "{}" for label, _ in inputs}) for task, inputs in YES_NO_QUESTIONS.items()
+}
+
+async def ask_yes_no(client: AsyncOpenAI, task: str, row: Dict[str, Any]) -> Tuple[str, str]:
+    """Ask one of the YES_NO_QUESTIONS about a control and return (answer, explanation)"""
+    prompt = YES_NO_TEMPLATES[task].format(*(row[column] for _, column in YES_NO_QUESTIONS[task]))
+    raw_response = await make_llm_call_with_retry(client, prompt, max_tokens=Config.MAX_TOKENS_ANSWER)
     if not raw_response:
         return "LLM error", "LLM error"
     
@@ -326,100 +853,11 @@ Respond in JSON:
     
     return data.get("answer", "LLM error"), data.get("explanation", "LLM error")
 
-def ask_execution_appropriateness(client: OpenAI, automation: str, risk_desc: str, control_desc: str) -> Tuple[str, str]:
-    """Assess execution appropriateness"""
-    prompt = f"""
-Given the automation type (Automated/Semi-Auto/Manual), risk description, and control description, answer:
-1. Is the control execution appropriate based on the control description and risk description? (Yes/No)
-2. Briefly explain your reasoning (1-2 sentences).
-
-Automation: {automation}
-Risk Description: {risk_desc}
-Control Description: {control_desc}
-
-Respond in JSON:
-{{
-  "answer": "Yes or No",
-  "explanation": "..."
-}}
-"""
-    raw_response = make_llm_call_with_retry(client, prompt)
-    if not raw_response:
-        return "LLM error", "LLM error"
-    
-    data = extract_json_from_response(raw_response)
-    if not data:
-        return "LLM error", "LLM error"
-    
-    return data.get("answer", "LLM error"), data.get("explanation", "LLM error")
-
-def ask_type_adequacy(client: OpenAI, control_type: str, risk_desc: str, control_desc: str) -> Tuple[str, str]:
-    """Assess control type adequacy"""
-    prompt = f"""
-Given the control type (Detective/Preventive), risk description, and control description, answer:
-1. Is the control type appropriate based on control description and adequate for the risk it addresses? (Yes/No)
-2. Briefly explain your reasoning (1-2 sentences).
-
-Type: {control_type}
-Risk Description: {risk_desc}
-Control Description: {control_desc}
-
-Respond in JSON:
-{{
-  "answer": "Yes or No",
-  "explanation": "..."
-}}
-"""
-    raw_response = make_llm_call_with_retry(client, prompt)
-    if not raw_response:
-        return "LLM error", "LLM error"
-    
-    data = extract_json_from_response(raw_response)
-    if not data:
-        return "LLM error", "LLM error"
-    
-    return data.get("answer", "LLM error"), data.get("explanation", "LLM error")
-
-def ask_frequency_appropriateness(client: OpenAI, frequency: str, risk_desc: str, control_desc: str) -> Tuple[str, str]:
-    """Assess frequency appropriateness"""
-    prompt = f"""
-Given the operation frequency, risk description, and control description, answer:
-1. Is the control frequency appropriate based on the control description and adequated for the associated risk? (Yes/No)
-2. Briefly explain your reasoning (1-2 sentences).
-
-Frequency: {frequency}
-Risk Description: {risk_desc}
-Control Description: {control_desc}
-
-Respond in JSON:
-{{
-  "answer": "Yes or No",
-  "explanation": "..."
-}}
-"""
-    raw_response = make_llm_call_with_retry(client, prompt)
-    if not raw_response:
-        return "LLM error", "LLM error"
-    
-    data = extract_json_from_response(raw_response)
-    if not data:
-        return "LLM error", "LLM error"
-    
-    return data.get("answer", "LLM error"), data.get("explanation", "LLM error")
-
-def ask_system_dependency(client: OpenAI, control_desc: str) -> Tuple[str, str]:
+@memoize_by_description
+async def ask_system_dependency(client: AsyncOpenAI, control_desc: str) -> Tuple[str, str]:
     """Extract system dependencies"""
-    prompt = f"""
-Given the control description, extract the names of any systems or data sources mentioned. List only the system or data source names (comma-separated if more than one). If none are mentioned, return "None found".
-
-Control Description: {control_desc}
-
-Respond in JSON:
-{{
-  "systems": "..."
-}}
-"""
-    raw_response = make_llm_call_with_retry(client, prompt)
+    prompt = task_prompt("systems", {"Control Description": control_desc})
+    raw_response = await make_llm_call_with_retry(client, prompt, max_tokens=Config.MAX_TOKENS_ANSWER)
     if not raw_response:
         return "LLM error", ""
     
@@ -429,51 +867,18 @@ Respond in JSON:
     
     return data.get("systems", "LLM error"), ""
 
-def ask_adaptability(client: OpenAI, control_desc: str) -> Tuple[str, str]:
-    """Assess control SOD"""
-    prompt = f"""
-Given the following control description, answer:
-1. Does the control ensure that no single individual has end-to-end responsibility for critical transactions so like proper Segregation of duties? (Yes/No)
-2. Briefly explain your reasoning (1-2 sentences).
-
-Control Description:
-{control_desc}
-
-Respond in JSON:
-{{
-  "answer": "Yes or No",
-  "explanation": "..."
-}}
-"""
-    raw_response = make_llm_call_with_retry(client, prompt)
-    if not raw_response:
-        return "LLM error", "LLM error"
-    
-    data = extract_json_from_response(raw_response)
-    if not data:
-        return "LLM error", "LLM error"
-    
-    return data.get("answer", "LLM error"), data.get("explanation", "LLM error")
-
-def ask_overall_rating(client: OpenAI, row: Dict[str, str], present: str, missing: str, adaptability: str) -> Tuple[str, str]:
+async def ask_overall_rating(client: AsyncOpenAI, row: Dict[str, str], present: str, missing: str, adaptability: str) -> Tuple[str, str]:
     """Provide overall control rating"""
-    prompt = f"""
-Given the following analysis of a control, provide an overall rating as one of the following: Effective, Partially effective, In-effective. Consider all the information below:
-- Control objective: {row['Control objective: Is the control designed able to mitigate the risk ?']}
-- Execution appropriateness: {row['Is the control execution appropriate for the risk being addressed?']}
-- Type adequacy: {row['Is the control type adequate for the risk it addresses']}
-- Frequency appropriateness: {row['Is the control frequency appropriate for the associated risk?']}
-- System/data dependencies: {row['System/data dependencies: Are the systems/data sources used reliable and secure?']}
-- Present: {present}
-- Missing: {missing}
-
-Return a JSON object:
-{{
-  "rating": "Effective, Partially effective, or In-effective",
-  "explanation": "..."
-}}
-"""
-    raw_response = make_llm_call_with_retry(client, prompt)
+    prompt = task_prompt("overall", {
+        "Control objective": row['Control objective: Is the control designed able to mitigate the risk ?'],
+        "Execution appropriateness": row['Is the control execution appropriate for the risk being addressed?'],
+        "Type adequacy": row['Is the control type adequate for the risk it addresses'],
+        "Frequency appropriateness": row['Is the control frequency appropriate for the associated risk?'],
+        "System/data dependencies": row['System/data dependencies: Are the systems/data sources used reliable and secure?'],
+        "Present": present,
+        "Missing": missing,
+    })
+    raw_response = await make_llm_call_with_retry(client, prompt, max_tokens=Config.MAX_TOKENS_ANSWER)
     if not raw_response:
         return "LLM error", "LLM error"
     
@@ -483,36 +888,96 @@ Return a JSON object:
     
     return data.get("rating", "LLM error"), data.get("explanation", "LLM error")
 
-def ask_expected_evidence(client: OpenAI, control_desc: str) -> str:
+@memoize_by_description
+async def ask_expected_evidence(client: AsyncOpenAI, control_desc: str) -> str:
     """Generate expected evidence list"""
-    prompt = f"""
-You are the world's best professional auditor with decades of experience testing control descriptions for completeness.
-
-Given the following control description, list the types of evidence an auditor or tester would expect to see to verify the control's operation. List each expected evidence as a separate numbered point (1., 2., 3., etc.).
-
-Control Description:
-{control_desc}
-
-Respond with a numbered list of expected evidence types only.
-"""
-    raw_response = make_llm_call_with_retry(client, prompt, "Respond only with the numbered list.")
+    prompt = task_prompt("evidence", {"Control Description": control_desc})
+    raw_response = await make_llm_call_with_retry(client, prompt, json_response=False,
+                                             max_tokens=Config.MAX_TOKENS_EVIDENCE)
     return raw_response.strip() if raw_response else "LLM error"
 
+async def ask_full_analysis(client: AsyncOpenAI, row: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    Answer all nine TOD questions for a control in a single LLM call.
+    
+    The risk and control text are sent once instead of once per question,
+    and the model returns every answer in one JSON object.
+    
+    Args:
+        client: OpenAI client instance
+        row: Input row holding the required columns
+        
+    Returns:
+        Parsed JSON object (empty if the call or parsing failed)
+    """
+    prompt = task_prompt("full", {
+        "Risk Description": row["Risk Description"],
+        "Control Description": f'"""{row["Control Description"]}"""',
+        "Automation": row["Automation"],
+        "Type": row["Detective/ Preventive"],
+        "Frequency": row["Operation Frequency"],
+    })
+    raw_response = await make_llm_call_with_retry(client, prompt, max_tokens=Config.MAX_TOKENS_FULL)
+    if not raw_response:
+        return {}
+    
+    return extract_json_from_response(raw_response) or {}
+
+def unpack_full_analysis(data: Dict[str, Any]) -> RowResult:
+    """Map a fused analysis object onto the row's results"""
+    def answer(key: str, field: str = "answer") -> Tuple[str, str]:
+        item = data.get(key)
+        if not isinstance(item, dict):
+            return "LLM error", "LLM error"
+        return item.get(field, "LLM error"), item.get("explanation", "LLM error")
+    
+    if isinstance(data.get("present"), dict):
+        pres = bullet_list(data["present"])
+        miss = bullet_list(data.get("missing") or {})
+        sugg = bullet_list(data.get("suggestions") or {})
+    else:
+        pres, miss, sugg = "", "LLM error", ""
+    
+    evidence = data.get("evidence", "LLM error")
+    if isinstance(evidence, list):
+        evidence = "\n".join(f"{i}. {item}" for i, item in enumerate(evidence, 1))
+    
+    result = RowResult(pres, miss, sugg, f"Present:\n{pres}\n\nMissing:\n{miss}",
+                       systems_ans=data.get("systems", "LLM error"), systems_exp="",
+                       expected_evidence=str(evidence).strip())
+    result.objective_ans, result.objective_exp = answer("objective")
+    result.execution_ans, result.execution_exp = answer("execution")
+    result.type_ans, result.type_exp = answer("type")
+    result.frequency_ans, result.frequency_exp = answer("frequency")
+    result.adaptability_ans, result.adaptability_exp = answer("sod")
+    result.overall_rating_ans, result.overall_rating_exp = answer("overall", "rating")
+    return result
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                               DATA PROCESSING
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def load_and_validate_data() -> pd.DataFrame:
-    """Load Excel file and validate required columns"""
+def load_and_validate_data(df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Load Excel file (unless controls are supplied in memory) and validate required columns"""
     try:
-        logger.info(f"Loading data from {Config.INPUT_FILE}")
-        df = pd.read_excel(Config.INPUT_FILE, engine="openpyxl")
+        if df is None:
+            logger.info(f"Loading data from {Config.INPUT_FILE}")
+            # pandas opens the workbook with load_workbook(read_only=True, data_only=True),
+            # i.e. openpyxl's streaming reader, so large inputs are not built up as a full DOM.
+            # Only the required columns are parsed, as plain text with blanks kept as "".
+            df = pd.read_excel(
+                Config.INPUT_FILE, engine=Config.EXCEL_ENGINE,
+                usecols=lambda col: col in Config.REQUIRED_COLS, dtype=str, na_filter=False
+            )
         
         # Validate required columns
         missing_cols = [col for col in Config.REQUIRED_COLS if col not in df.columns]
         if missing_cols:
             raise ValueError(f"Missing required columns: {missing_cols}")
         
+        # Other input columns are not used by the analysis or carried into the report
+        df = df[Config.REQUIRED_COLS]
+        
         logger.info(f"✔ Loaded {len(df)} controls with all required columns")
         return df
         
@@ -520,244 +985,491 @@ def load_and_validate_data() -> pd.DataFrame:
         logger.error(f"⚠ Could not read {Config.INPUT_FILE} → {e}")
         sys.exit(1)
 
-def process_controls(client: OpenAI, df: pd.DataFrame) -> pd.DataFrame:
-    """Process all controls and generate analysis results"""
-    logger.info("Starting control analysis...")
+async def find_similar_controls(client: AsyncOpenAI, df: pd.DataFrame) -> Dict[int, int]:
+    """
+    Group controls whose descriptions are near-identical so each group is analyzed once.
+    
+    Descriptions are embedded in as few requests as possible and compared by
+    cosine similarity. Groups are built greedily: each control not yet grouped
+    becomes the representative of every later control above the threshold
+    that also has the same risk, automation, type and frequency.
+    
+    Returns:
+        Row position -> position of the representative whose results it reuses
+    """
+    descriptions = df["Control Description"].tolist()
+    candidates = [i for i, text in enumerate(descriptions) if text.strip()]
+    if len(candidates) < 2:
+        return {}
+    
+    vectors = []
+    for start in range(0, len(candidates), Config.EMBEDDING_BATCH_SIZE):
+        batch = await make_embedding_call_with_retry(
+            client, [descriptions[i] for i in candidates[start:start + Config.EMBEDDING_BATCH_SIZE]]
+        )
+        if batch is None:
+            logger.warning("⚠ Could not embed control descriptions, analyzing every control")
+            return {}
+        vectors.extend(batch)
+    
+    embeddings = np.array(vectors, dtype=np.float32)
+    embeddings /= np.linalg.norm(embeddings, axis=1, keepdims=True)
+    context = list(df[["Risk Description", "Automation", "Detective/ Preventive", "Operation Frequency"]]
+                   .itertuples(index=False, name=None))
     
-    # Initialize result lists
-    present_list, missing_list, suggestion_list = [], [], []
-    objective_ans, objective_exp = [], []
-    exec_ans, exec_exp = [], []
-    type_ans, type_exp = [], []
-    freq_ans, freq_exp = [], []
-    sysdep_ans, sysdep_exp = [], []
-    present_missing_list = []
-    adaptability_ans, adaptability_exp = [], []
-    overall_rating_ans, overall_rating_exp = [], []
-    potential_evidence_list = []
+    representative_of: Dict[int, int] = {}
+    for a, i in enumerate(candidates):
+        if i in representative_of:
+            continue
+        similarity = embeddings[a + 1:] @ embeddings[a]
+        for b in np.flatnonzero(similarity >= Config.SIMILARITY_THRESHOLD) + a + 1:
+            j = candidates[b]
+            if j not in representative_of and context[j] == context[i]:
+                representative_of[j] = i
+    
+    logger.info(f"✔ {len(representative_of)} of {len(df)} controls reuse the results of a near-identical control")
+    return representative_of
 
+async def analyze_control(client: AsyncOpenAI, idx: int, row: Dict[str, Any], total_controls: int) -> RowResult:
+    """
+    Run all nine analyses for a single control.
+    
+    With Config.FUSE_QUESTIONS the nine answers come back from one combined
+    prompt. Otherwise the eight independent questions are issued concurrently
+    and the overall rating follows once their answers are known.
+    
+    Returns:
+        RowResult for the control (all "Processing error" if the analysis failed)
+    """
+    control_name = row.get("Control", f"Control_{idx+1}")
+    logger.info(f"Processing [{idx+1}/{total_controls}]: {control_name}")
+    
+    try:
+        if Config.FUSE_QUESTIONS:
+            results = unpack_full_analysis(await ask_full_analysis(client, row))
+            logger.info(f"  ✓ Completed analysis for {control_name}")
+            return results
+        
+        (
+            (pres, miss, sugg),                  # 1. Completeness analysis
+            (ans5, exp5),                        # 6. System/data dependencies
+            expected_evidence,                   # 9. Expected evidence
+            (ans, exp),                          # 2. Control objective
+            (ans2, exp2),                        # 3. Execution appropriateness
+            (ans3, exp3),                        # 4. Type adequacy
+            (ans4, exp4),                        # 5. Frequency appropriateness
+            (ans6, exp6),                        # 7. Adaptability
+        ) = await asyncio.gather(
+            ask_llm(client, row["Control Description"]),
+            ask_system_dependency(client, row["Control Description"]),
+            ask_expected_evidence(client, row["Control Description"]),
+            *(ask_yes_no(client, task, row) for task in YES_NO_QUESTIONS),
+        )
+        present_missing = f"Present:\n{pres}\n\nMissing:\n{miss}"
+        
+        # 8. Overall Rating
+        overall_row = {
+            'Control objective: Is the control designed able to mitigate the risk ?': ans,
+            'Is the control execution appropriate for the risk being addressed?': ans2,
+            'Is the control type adequate for the risk it addresses': ans3,
+            'Is the control frequency appropriate for the associated risk?': ans4,
+            'System/data dependencies: Are the systems/data sources used reliable and secure?': ans5
+        }
+        if _batch_pending is not None and "LLM error" in (miss, ans, ans2, ans3, ans4, ans5):
+            # Batch mode: the rating prompt is built from the answers above, so
+            # it is only queued once those have come back from an earlier batch
+            ans7, exp7 = "LLM error", "LLM error"
+        else:
+            ans7, exp7 = await ask_overall_rating(client, overall_row, pres, miss, ans6)
+        
+        logger.info(f"  ✓ Completed analysis for {control_name}")
+        return RowResult(pres, miss, sugg, present_missing, ans, exp, ans2, exp2, ans3, exp3,
+                         ans4, exp4, ans5, exp5, ans6, exp6, ans7, exp7, expected_evidence)
+        
+    except Exception as e:
+        logger.error(f"  ✗ Error processing {control_name}: {e}")
+        # Every field defaults to the error placeholder, so the row stays aligned
+        return RowResult()
+
+def checkpoint_key(row: Dict[str, Any]) -> str:
+    """Identify a control by its input values, so a resumed run only reuses rows that did not change"""
+    return hashlib.sha256(orjson.dumps(row, default=str)).hexdigest()
+
+def analysis_fingerprint() -> str:
+    """Hash of the settings that shape the answers, so a checkpoint is only reused with the same ones"""
+    settings = [
+        Config.MODEL, Config.TEMPERATURE, Config.TOP_P, Config.SEED, Config.FUSE_QUESTIONS,
+        Config.MAX_TOKENS_ANSWER, Config.MAX_TOKENS_COMPLETENESS, Config.MAX_TOKENS_EVIDENCE,
+        Config.MAX_TOKENS_FULL, SYSTEM_PROMPT, YES_NO_TEMPLATES,
+    ]
+    return hashlib.sha256(orjson.dumps(settings)).hexdigest()
+
+def checkpoint_header() -> list:
+    """First two lines of the checkpoint: the settings fingerprint, then the column names"""
+    return [["settings", analysis_fingerprint()], ["row_key", *(f.name for f in fields(RowResult))]]
+
+def drop_partial_record(path: Path):
+    """Cut a last record left half-written by a crash, so the next append starts on a fresh line"""
+    content = path.read_bytes()
+    # csv.writer ends records with \r\n; newlines inside the answers are a bare \n
+    if content and not content.endswith(b"\r\n"):
+        end = content.rfind(b"\r\n")
+        with open(path, "rb+") as f:
+            f.truncate(end + 2 if end >= 0 else 0)
+
+def load_checkpoint() -> Dict[str, RowResult]:
+    """Read the rows finished by an earlier, interrupted run, keyed by checkpoint_key"""
+    path = Config.CHECKPOINT_FILE
+    if not path.exists():
+        return {}
+    
+    drop_partial_record(path)
+    names = [f.name for f in fields(RowResult)]
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        settings, header = next(reader, None), next(reader, None)
+        if [settings, header] != checkpoint_header():
+            if header == ["row_key", *names]:
+                logger.warning(f"⚠ Ignoring {path}: the model, prompts or settings changed since it was written")
+            elif settings is not None:
+                logger.warning(f"⚠ Ignoring {path}: it was written by a different version of this tool")
+            return {}
+        done = {record[0]: RowResult(*record[1:]) for record in reader if len(record) == len(names) + 1}
+    
+    logger.info(f"✔ Resuming: {len(done)} controls already analyzed in {path}")
+    return done
+
+async def process_controls(client: AsyncOpenAI, df: pd.DataFrame,
+                           representative_of: Optional[Mapping[int, int]] = None) -> pd.DataFrame:
+    """
+    Process all controls concurrently and generate analysis results
+    
+    Args:
+        client: OpenAI client instance
+        df: Validated controls
+        representative_of: Rows that copy another row's results (from find_similar_controls)
+    """
+    global _llm_semaphore
+    logger.info("Starting control analysis...")
+    _llm_semaphore = asyncio.Semaphore(Config.MAX_CONCURRENCY)
+    _description_memo.clear()
+    
     total_controls = len(df)
+    records = df.to_dict("records")
+    done = load_checkpoint()
     
-    for idx, row in df.iterrows():
-        control_name = row.get("Control", f"Control_{idx+1}")
-        logger.info(f"Processing [{idx+1}/{total_controls}]: {control_name}")
+    with open(Config.CHECKPOINT_FILE, "a", newline="", encoding="utf-8") as checkpoint:
+        writer = csv.writer(checkpoint)
+        if not done:
+            checkpoint.truncate(0)
+            writer.writerows(checkpoint_header())
         
-        try:
-            # 1. Completeness analysis
-            pres, miss, sugg = ask_llm(client, row["Control Description"])
-            present_list.append(pres)
-            missing_list.append(miss)
-            suggestion_list.append(sugg)
-            present_missing = f"Present:\n{pres}\n\nMissing:\n{miss}"
-            present_missing_list.append(present_missing)
-            
-            # 2. Control objective
-            ans, exp = ask_control_objective(client, row["Risk Description"], row["Control Description"])
-            objective_ans.append(ans)
-            objective_exp.append(exp)
-            
-            # 3. Execution appropriateness
-            ans2, exp2 = ask_execution_appropriateness(client, row["Automation"], row["Risk Description"], row["Control Description"])
-            exec_ans.append(ans2)
-            exec_exp.append(exp2)
-            
-            # 4. Type adequacy
-            ans3, exp3 = ask_type_adequacy(client, row["Detective/ Preventive"], row["Risk Description"], row["Control Description"])
-            type_ans.append(ans3)
-            type_exp.append(exp3)
-            
-            # 5. Frequency appropriateness
-            ans4, exp4 = ask_frequency_appropriateness(client, row["Operation Frequency"], row["Risk Description"], row["Control Description"])
-            freq_ans.append(ans4)
-            freq_exp.append(exp4)
-            
-            # 6. System/data dependencies
-            ans5, exp5 = ask_system_dependency(client, row["Control Description"])
-            sysdep_ans.append(ans5)
-            sysdep_exp.append(exp5)
-            
-            # 7. Adaptability
-            ans6, exp6 = ask_adaptability(client, row["Control Description"])
-            adaptability_ans.append(ans6)
-            adaptability_exp.append(exp6)
-            
-            # 8. Overall Rating
-            overall_row = {
-                'Control objective: Is the control designed able to mitigate the risk ?': ans,
-                'Is the control execution appropriate for the risk being addressed?': ans2,
-                'Is the control type adequate for the risk it addresses': ans3,
-                'Is the control frequency appropriate for the associated risk?': ans4,
-                'System/data dependencies: Are the systems/data sources used reliable and secure?': ans5
-            }
-            ans7, exp7 = ask_overall_rating(client, overall_row, pres, miss, ans6)
-            overall_rating_ans.append(ans7)
-            overall_rating_exp.append(exp7)
-            
-            # 9. Expected evidence
-            expected_evidence = ask_expected_evidence(client, row["Control Description"])
-            potential_evidence_list.append(expected_evidence)
-            
-            logger.info(f"  ✓ Completed analysis for {control_name}")
-            
-        except Exception as e:
-            logger.error(f"  ✗ Error processing {control_name}: {e}")
-            # Add error placeholders to maintain data consistency
-            for lst in [present_list, missing_list, suggestion_list, present_missing_list,
-                       objective_ans, objective_exp, exec_ans, exec_exp, type_ans, type_exp,
-                       freq_ans, freq_exp, sysdep_ans, sysdep_exp, adaptability_ans, adaptability_exp,
-                       overall_rating_ans, overall_rating_exp, potential_evidence_list]:
-                if len(lst) <= idx:
-                    lst.append("Processing error")
-
-    # Add all results to DataFrame (maintaining exact same column structure)
-    df["Present & Missing"] = present_missing_list
-    
-    # Remove columns if they exist (same as original)
-    for col in ["Present", "Missing"]:
-        if col in df.columns:
-            del df[col]
-    
-    df["Suggestions"] = suggestion_list
-    
-    # Remove Source column if it exists
-    if "Source" in df.columns:
-        del df["Source"]
-    
-    # Add all analysis columns (same order as original)
-    df["Control objective: Is the control designed able to mitigate the risk ?"] = objective_ans
-    df["Control objective: Explanation"] = objective_exp
-    df["Is the control execution appropriate for the risk being addressed?"] = exec_ans
-    df["Execution appropriateness: Explanation"] = exec_exp
-    df["Is the control type adequate for the risk it addresses"] = type_ans
-    df["Type adequacy: Explanation"] = type_exp
-    df["Is the control frequency appropriate for the associated risk?"] = freq_ans
-    df["Frequency appropriateness: Explanation"] = freq_exp
-    df["System/data dependencies: Are the systems/data sources used reliable and secure?"] = sysdep_ans
-    df["Adaptability - Is the control adaptable to new risks or process changes?"] = adaptability_ans
-    df["Adaptability: Explanation"] = adaptability_exp
-    df["Overall Rating"] = overall_rating_ans
-    df["Overall Rating: Explanation"] = overall_rating_exp
-    df["Potential Evidences Expected Based on Control Description"] = potential_evidence_list
-
-    # Remove System/data dependencies: Explanation column if it exists
-    if "System/data dependencies: Explanation" in df.columns:
-        del df["System/data dependencies: Explanation"]
-
-    # Update Present & Missing column header (same as original)
-    present_missing_col = "Has the control been formally documented? (When, Why, Who, What, Where and How)"
-    if "Present & Missing" in df.columns:
-        df.rename(columns={"Present & Missing": present_missing_col}, inplace=True)
+        async def analyze_and_checkpoint(idx: int, row: Dict[str, Any]) -> RowResult:
+            key = checkpoint_key(row)
+            if key in done:
+                return done[key]
+            result = await analyze_control(client, idx, row, total_controls)
+            values = astuple(result)
+            # Rows with errors are left out so a resumed run tries them again
+            if "Processing error" not in values and "LLM error" not in values:
+                # Only record ends may contain \r\n, which drop_partial_record relies on
+                writer.writerow([key, *(value.replace("\r\n", "\n").replace("\r", "\n") for value in values)])
+                checkpoint.flush()
+            return result
+        
+        representative_of = representative_of or {}
+        tasks = {
+            idx: asyncio.ensure_future(analyze_and_checkpoint(idx, row))
+            for idx, row in enumerate(records) if idx not in representative_of
+        }
+        
+        # Results come back in row order regardless of completion order
+        results = await asyncio.gather(*(
+            tasks[representative_of.get(idx, idx)] for idx in range(total_controls)
+        ))
+    
+    # Add all analysis columns in one step, built column-wise under their report headers
+    analysis = pd.DataFrame(
+        {header: [getattr(result, name) for result in results] for name, header in RESULT_COLUMNS.items()},
+        index=df.index
+    )
+    df = pd.concat([df, analysis], axis=1)
 
     logger.info("✓ Control analysis completed")
     return df
 
+# ═══════════════════════════════════════════════════════════════════════════════
+#                               BATCH API
+# ═══════════════════════════════════════════════════════════════════════════════
+
+async def submit_batch(client: AsyncOpenAI, requests: Dict[str, Dict[str, Any]]) -> Dict[str, Optional[str]]:
+    """
+    Submit chat requests as one Batch API job and wait for it to finish.
+    
+    Args:
+        client: OpenAI client instance
+        requests: Chat completion bodies keyed by request_key (used as custom_id)
+        
+    Returns:
+        Response text per request key; None for requests that did not succeed
+    """
+    lines = b"\n".join(
+        orjson.dumps({"custom_id": key, "method": "POST", "url": "/v1/chat/completions", "body": body})
+        for key, body in requests.items()
+    )
+    batch_file = await client.files.create(file=("tod_batch.jsonl", lines), purpose="batch")
+    batch = await client.batches.create(
+        input_file_id=batch_file.id,
+        endpoint="/v1/chat/completions",
+        completion_window="24h"
+    )
+    logger.info(f"Submitted batch {batch.id} with {len(requests)} requests")
+    
+    while batch.status not in ("completed", "failed", "expired", "cancelled"):
+        await asyncio.sleep(Config.BATCH_POLL_INTERVAL)
+        batch = await client.batches.retrieve(batch.id)
+        logger.info(f"Batch {batch.id} status: {batch.status}")
+    
+    if not batch.output_file_id:
+        raise RuntimeError(f"Batch {batch.id} ended with status '{batch.status}' and no output")
+    
+    # Demultiplex the output file back to the originating requests
+    results: Dict[str, Optional[str]] = dict.fromkeys(requests)
+    output = await client.files.content(batch.output_file_id)
+    for line in output.text.splitlines():
+        if not line.strip():
+            continue
+        item = orjson.loads(line)
+        response = item.get("response") or {}
+        if response.get("status_code") == 200:
+            results[item["custom_id"]] = response["body"]["choices"][0]["message"]["content"].strip()
+    
+    failed = sum(1 for content in results.values() if content is None)
+    if failed:
+        logger.warning(f"⚠ {failed} of {len(requests)} batch requests failed; their answers are reported as LLM error")
+    return results
+
+async def run_batch_analysis(client: AsyncOpenAI, df: pd.DataFrame,
+                             representative_of: Optional[Mapping[int, int]] = None) -> pd.DataFrame:
+    """
+    Analyze controls through the Batch API instead of live calls.
+    
+    process_controls is replayed until every prompt it builds has an answer:
+    each pass collects the prompts that are not answered yet, and those are
+    submitted as one batch. The overall rating depends on the other answers,
+    so a full analysis takes two batches.
+    """
+    global _batch_responses, _batch_pending
+    _batch_responses = {}
+    try:
+        while True:
+            _batch_pending = {}
+            df_results = await process_controls(client, df, representative_of)
+            if not _batch_pending:
+                return df_results
+            _batch_responses.update(await submit_batch(client, _batch_pending))
+    finally:
+        _batch_responses = _batch_pending = None
+
 # ═══════════════════════════════════════════════════════════════════════════════
 #                               EXCEL OUTPUT
 # ═══════════════════════════════════════════════════════════════════════════════
 
+# Report cell formats: centered, wrapped text for all cells; bold (red when something
+# is missing) for Present & Missing. xlsxwriter formats belong to a workbook, so
+# only their properties are built once here
+CELL_FORMAT = {"align": "center", "valign": "vcenter", "text_wrap": True}
+HEADER_FORMAT = {**CELL_FORMAT, "bold": True, "border": 1}
+PRESENT_FORMAT = {**CELL_FORMAT, "bold": True}
+MISSING_FORMAT = {**CELL_FORMAT, "bold": True, "font_color": "#FF0000"}
+
+# Fonts for the rich-text runs of a Present & Missing cell, by run style
+RUN_FORMATS = {
+    None: {},
+    "bold": {"bold": True},
+    "red": {"bold": True, "font_color": "#FF0000"},
+}
+
+# Report columns that hold Present & Missing blocks; only these are scanned and
+# written as rich text, every other column is plain text
+RICH_TEXT_COLUMNS = ("Has the control been formally documented? (When, Why, Who, What, Where and How)",)
+
+# A "Present:"/"Missing:" heading or the "• element:" label of a bullet, at the start of a line
+RICH_TEXT_RE = re.compile(r"(?m)^[ \t]*(?:(?P<present>Present:)|(?P<missing>Missing:)|(?P<element>•[^:\n]*:))")
+
+RichRuns = Tuple[Tuple[Optional[str], str], ...]
+
+# Blocks repeat verbatim across rows (the same missing elements, error placeholders),
+# and the result is an immutable tuple, so it is safe to share between cells
+@functools.lru_cache(maxsize=4096)
+def mark_rich_text(value: str) -> Tuple[RichRuns, bool, bool]:
+    """
+    Split a Present & Missing block into (style, text) runs for a rich-text cell.
+    
+    Headings and element names are "bold", element names under "Missing:" are
+    "red", and all other text is plain (None). The texts join back to the value.
+    
+    Returns:
+        Tuple of (runs, whether any element is red, whether any heading or element was found)
+    """
+    # Headings and bullets all contain a colon, so placeholders such as
+    # "LLM error" and empty cells stay one plain run
+    if ":" not in value:
+        return ((None, value),), False, False
+    
+    state = {"has_red": False, "modified": False}
+    runs = tuple(_rich_runs(value, state))
+    return runs, state["has_red"], state["modified"]
+
+def _rich_runs(value: str, state: Dict[str, bool]):
+    """Yield the non-empty runs of a Present & Missing block, noting in state what was found"""
+    in_missing = False
+    pos = 0
+    for match in RICH_TEXT_RE.finditer(value):
+        kind = match.lastgroup
+        start = match.start(kind)
+        if kind != "element":
+            in_missing = kind == "missing"
+            style = "bold"
+        elif in_missing:
+            style = "red"
+            state["has_red"] = True
+        else:
+            style = "bold"
+        state["modified"] = True
+        if start > pos:
+            yield None, value[pos:start]
+        yield style, value[start:match.end()]
+        pos = match.end()
+    if pos < len(value):
+        yield None, value[pos:]
+
 def save_results_to_excel(df: pd.DataFrame):
-    """Save results to Excel with formatting (identical to original)"""
+    """
+    Save results to Excel with formatting
+    
+    The sheet is streamed with xlsxwriter in constant_memory mode, so rows go
+    straight to disk in order: the INPUT/OUTPUT banner first, then the header
+    on row 3 and the results from row 4.
+    """
     logger.info(f"Saving results to {Config.OUTPUT_FILE}")
     
+    input_cols = [
+        "Risk", "Risk Description", "Control", "Control Description",
+        "Automation", "Detective/ Preventive", "Operation Frequency"
+    ]
+    output_cols = [col for col in df.columns if col not in input_cols]
+    # Every value as text, with NaN blanked out so it is written as an empty cell
+    values = df.fillna("").astype(str)
+    
+    rich_cols = [col for col in RICH_TEXT_COLUMNS if col in values.columns]
+    rich_idxs = [values.columns.get_loc(col) for col in rich_cols]
+    
+    # Auto-width (same as original), counting the banner and header rows
+    widths = [len(col) for col in values.columns]
+    widths[0] = max(widths[0], len("INPUT COLUMNS"))
+    widths[len(input_cols)] = max(widths[len(input_cols)], len("OUTPUT COLUMNS"))
+    
+    # Split the rich-text columns into runs and note which cells need the red
+    # format (repeated blocks come from mark_rich_text's cache)
+    cells = [value for col in rich_cols for value in values[col]]
+    formatted = list(map(mark_rich_text, cells))
+    
+    # One pass over the results, before the workbook is opened: pair each row
+    # with its rich-text cells and track the widest value per column. The rich
+    # cells are blanked in the plain row; empty strings are not written. Writing
+    # the streamed sheet is then only output, in row order.
+    rows = []
+    for row_pos, row in enumerate(values.itertuples(index=False, name=None)):
+        for col_idx, value in enumerate(row):
+            length = len(value)
+            if length > widths[col_idx]:
+                widths[col_idx] = length
+        rich_cells = [(col_idx, *formatted[n * len(values) + row_pos]) for n, col_idx in enumerate(rich_idxs)]
+        if rich_cells:
+            row = list(row)
+            for col_idx in rich_idxs:
+                row[col_idx] = ""
+        rows.append((row, rich_cells))
+    
+    # Every value is written as text: no formula, URL or number detection on strings
+    options = {
+        "constant_memory": True,
+        "strings_to_formulas": False,
+        "strings_to_urls": False,
+        "strings_to_numbers": False,
+    }
+    # Written next to the report and moved over it once complete, so an interrupted
+    # save never leaves a truncated report behind
+    tmp_file = Config.OUTPUT_FILE.with_name(Config.OUTPUT_FILE.name + ".tmp")
     try:
-        with pd.ExcelWriter(Config.OUTPUT_FILE, engine="openpyxl") as xl:
-            df.to_excel(xl, sheet_name="TOD Results", index=False, startrow=2)
-
-            wb = xl.book
-            ws = wb["TOD Results"]
-
-            # Insert two rows at the top
-            ws.insert_rows(1, amount=2)
+        with xlsxwriter.Workbook(str(tmp_file), options) as wb:
+            ws = wb.add_worksheet("TOD Results")
+            
+            cell_fmt = wb.add_format(CELL_FORMAT)
+            header_fmt = wb.add_format(HEADER_FORMAT)
+            # Rich-text cell format, indexed by whether the cell has red (missing) elements
+            rich_fmts = (wb.add_format(PRESENT_FORMAT), wb.add_format(MISSING_FORMAT))
+            run_fmts = {style: wb.add_format(props) for style, props in RUN_FORMATS.items()}
+            
+            # The alignment is set once per column; cells written without a format inherit it
+            for col_idx, width in enumerate(widths):
+                ws.set_column(col_idx, col_idx, min(width + 2, 60), cell_fmt)
             
             # Merge and label input columns
-            input_cols = [
-                "Risk", "Risk Description", "Control", "Control Description",
-                "Automation", "Detective/ Preventive", "Operation Frequency"
-            ]
-            output_cols = [col for col in df.columns if col not in input_cols and col != "Source"]
-            ws.merge_cells(start_row=1, start_column=1, end_row=1, end_column=len(input_cols))
-            ws.cell(row=1, column=1).value = "INPUT COLUMNS"
-            ws.merge_cells(start_row=1, start_column=len(input_cols)+1, end_row=1, end_column=len(input_cols)+len(output_cols))
-            ws.cell(row=1, column=len(input_cols)+1).value = "OUTPUT COLUMNS"
-
-            # Remove Source column if present
-            if "Source" in [cell.value for cell in ws[3] if cell.value]:
-                try:
-                    idx = [cell.value for cell in ws[3]].index("Source") + 1
-                    ws.delete_cols(idx)
-                except (ValueError, IndexError):
-                    pass  # Source column not found, ignore
-
-            # Set alignment and wrap text for all cells
-            align = Alignment(horizontal="center", vertical="center", wrap_text=True)
-            for row in ws.iter_rows():
-                for cell in row:
-                    cell.alignment = align
-
-            # Apply formatting to the Present & Missing column (identical to original)
-            from openpyxl.styles import Font, PatternFill
-            present_missing_col = "Has the control been formally documented? (When, Why, Who, What, Where and How)"
-            present_missing_idx = None
-            for idx, cell in enumerate(ws[3], 1):
-                if cell.value == present_missing_col:
-                    present_missing_idx = idx
-                    break
-            if present_missing_idx:
-                for row in ws.iter_rows(min_row=4, min_col=present_missing_idx, max_col=present_missing_idx, max_row=ws.max_row):
-                    cell = row[0]
-                    value = cell.value or ""
-                    # Try to mimic rich formatting (same logic as original)
-                    lines = value.split("\n")
-                    new_lines = []
-                    for line in lines:
-                        if line.strip().startswith("Present:"):
-                            new_lines.append("**Present:**" + line[len("Present:"):])
-                        elif line.strip().startswith("Missing:"):
-                            new_lines.append("**Missing:**" + line[len("Missing:"):])
-                        elif line.strip().startswith("•"):
-                            # Bold element name (before ':')
-                            if ":" in line:
-                                elem, rest = line.split(":", 1)
-                                elem = elem.strip()
-                                # If in missing section, color red
-                                if any("Missing" in l for l in new_lines[-2:]):
-                                    # Use red font for whole line
-                                    new_lines.append(f"[RED]{elem}:[/RED]{rest}")
-                                else:
-                                    new_lines.append(f"**{elem}:**{rest}")
-                            else:
-                                new_lines.append(line)
-                        else:
-                            new_lines.append(line)
-                    # Compose new value with formatting hints
-                    cell.value = "\n".join(new_lines)
-                    # Make whole cell bold for Present & Missing
-                    cell.font = Font(bold=True)
-                    # If any [RED] marker, color cell red (simulate missing points)
-                    if any("[RED]" in l for l in new_lines):
-                        cell.font = Font(bold=True, color="FF0000")
+            ws.merge_range(0, 0, 0, len(input_cols) - 1, "INPUT COLUMNS", cell_fmt)
+            ws.merge_range(0, len(input_cols), 0, len(input_cols) + len(output_cols) - 1, "OUTPUT COLUMNS", cell_fmt)
+            
+            ws.write_row(2, 0, values.columns, header_fmt)
+            for row_idx, (row, rich_cells) in enumerate(rows, 3):
+                # Whole rows go through write_row; only the rich-text cells get their own format
+                ws.write_row(row_idx, 0, row)
+                for col_idx, runs, has_red, modified in rich_cells:
+                    # Cells with nothing marked up (errors, blanks) keep the column's plain format
+                    rich_fmt = rich_fmts[has_red] if modified else None
+                    if len(runs) > 1:
+                        fragments = []
+                        for style, text in runs:
+                            fragments += (run_fmts[style], text)
+                        ws.write_rich_string(row_idx, col_idx, *fragments, rich_fmt)
                     else:
-                        cell.font = Font(bold=True)
-
-            # Auto-width (same as original)
-            for col_idx, _ in enumerate(ws[3], 1):
-                max_len = max(len(str(ws.cell(row=r, column=col_idx).value or "")) for r in range(1, ws.max_row + 1))
-                ws.column_dimensions[get_column_letter(col_idx)].width = min(max_len + 2, 60)
-
-            wb.save(Config.OUTPUT_FILE)
-
-        logger.info(f"✓ Results saved successfully to {Config.OUTPUT_FILE}")
+                        ws.write_string(row_idx, col_idx, runs[0][1], rich_fmt)
         
-    except Exception as e:
-        logger.error(f"Error saving Excel file: {e}")
+        os.replace(tmp_file, Config.OUTPUT_FILE)
+    except BaseException:
+        # Including Ctrl+C: leave no half-written temp file behind
+        tmp_file.unlink(missing_ok=True)
         raise
+    
+    logger.info(f"✓ Results saved successfully to {Config.OUTPUT_FILE}")
 
 # ═══════════════════════════════════════════════════════════════════════════════
 #                               MAIN EXECUTION
 # ═══════════════════════════════════════════════════════════════════════════════
 
-def main():
-    """Main execution function"""
+async def analyze_controls(df: Optional[pd.DataFrame] = None) -> pd.DataFrame:
+    """Initialize the client, load and validate the controls, and analyze them"""
+    client = await initialize_client()
+    open_http_session()
+    open_response_cache()
+    try:
+        df = load_and_validate_data(df)
+        representative_of = await find_similar_controls(client, df) if Config.DEDUPE_SIMILAR else {}
+        if Config.USE_BATCH_API:
+            return await run_batch_analysis(client, df, representative_of)
+        return await process_controls(client, df, representative_of)
+    finally:
+        close_response_cache()
+        await close_http_session()
+        await client.close()
+
+def main(df: Optional[pd.DataFrame] = None):
+    """
+    Main execution function
+    
+    Args:
+        df: Controls to analyze; read from Config.INPUT_FILE when omitted
+    """
     start_time = time.time()
     
     try:
@@ -765,23 +1477,18 @@ def main():
         logger.info("AI-Powered TOD Control Testing Framework")
         logger.info("="*80)
         
-        # Initialize client
-        client = initialize_client()
-        
-        # Load and validate data
-        df = load_and_validate_data()
-        
-        # Process controls
-        df_results = process_controls(client, df)
+        # Initialize client, load data and process controls
+        df_results = asyncio.run(analyze_controls(df))
         
         # Save results
         save_results_to_excel(df_results)
+        Config.CHECKPOINT_FILE.unlink(missing_ok=True)
         
         # Summary
         elapsed_time = time.time() - start_time
         logger.info("="*80)
         logger.info(f"✓ Analysis completed successfully!")
-        logger.info(f"✓ Processed {len(df)} controls in {elapsed_time:.1f} seconds")
+        logger.info(f"✓ Processed {len(df_results)} controls in {elapsed_time:.1f} seconds")
         logger.info(f"✓ Results saved to: {Config.OUTPUT_FILE}")
         logger.info("="*80)
         
@@ -791,6 +1498,9 @@ def main():
     except Exception as e:
         logger.error(f"✗ Analysis failed: {e}")
         sys.exit(1)
+    finally:
+        # Callers such as demo.py print right after main() returns
+        flush_logging()
 
 if __name__ == "__main__":
     main()